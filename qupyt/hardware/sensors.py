@@ -1,5 +1,6 @@
 # pylint: disable=logging-format-interpolation
 # pylint: disable=logging-not-lazy
+# pylint: disable=import-outside-toplevel
 """
 Sensor Module handling the creation and usage of sensors.
 """
@@ -8,15 +9,22 @@ import sys
 import os
 import gc
 import logging
+import math
 import traceback
 from time import time
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any, List
+from typing import Optional, Callable, Dict, Any, Iterator, List, Tuple
 import ctypes
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
-from pypylon import pylon
-from harvesters.core import Harvester
+
+try:
+    from numba import njit, prange
+
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
 
 try:
     from egrabber import (
@@ -41,7 +49,9 @@ except ImportError:
 from qupyt.hardware.synchronisers import Synchroniser
 from qupyt.mixins import ConfigurationMixin, UpdateConfigurationType, ConfigurationError
 
-# Imports for HeliCam
+# Search path for the HeliCam wrapper. The vendor SDKs (pypylon, harvesters,
+# libHeLIC and nidaqmx) are imported by the sensor classes that need them,
+# so that only the hardware actually in use is loaded.
 if sys.platform == "win32":
     # from msvcrt import getch
     prgPath = os.environ["PROGRAMFILES"]
@@ -50,31 +60,46 @@ if sys.platform == "win32":
 else:
     # from getch import getch
     sys.path.insert(0, r"/usr/share/libhelic/python/wrapper")
-try:
-    import libHeLIC as heli
-except ImportError:
-    logging.warning(
-        "Could not load HeliCam library".ljust(65, ".")
-        + "[failed]\nIf you are not using a HeliCam you do not need this!"
-    )
-try:
-    import nidaqmx
-    from nidaqmx.constants import (
-        Edge,
-        AcquisitionType,
-        VoltageUnits,
-        TerminalConfiguration,
-    )
-except ImportError:
-    logging.warning(
-        "Could not load NI-DAQ library".ljust(65, ".")
-        + "[failed]\nIf you are not using a NI-DAQ you do not need this!"
-    )
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(os.path.dirname(SCRIPT_DIR))
 
 
+def _deinterleave_numpy(raw: np.ndarray, out: np.ndarray) -> None:
+    """
+    Flattens heliCam frames of shape [n, h, w, 2] into [2n, h, w],
+    where the two sub frames of frame n end up at 2n and 2n + 1.
+    """
+    out.reshape(raw.shape[0], 2, *raw.shape[1:3])[...] = raw.transpose(0, 3, 1, 2)
+
+
+_deinterleave: Callable[[np.ndarray, np.ndarray], None]
+_fill_poisson_large: Optional[Callable[[np.ndarray, float], None]]
+if HAS_NUMBA:
+
+    @njit(parallel=True, cache=True)
+    def _deinterleave(raw: np.ndarray, out: np.ndarray) -> None:
+        for n in prange(raw.shape[0]):  # pylint: disable=not-an-iterable
+            out[2 * n] = raw[n, :, :, 0]
+            out[2 * n + 1] = raw[n, :, :, 1]
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _fill_poisson_large(out: np.ndarray, lam: float) -> None:
+        """
+        Fills a contiguous uint16 array with Poisson(lam) samples using
+        the normal approximation, which is accurate for large lam.
+        """
+        flat = out.reshape(out.size)
+        sigma = math.sqrt(lam)
+        for i in prange(flat.size):  # pylint: disable=not-an-iterable
+            val = int(lam + sigma * np.random.standard_normal() + 0.5)
+            flat[i] = min(max(val, 0), 65535)
+
+else:
+    _deinterleave = _deinterleave_numpy
+    _fill_poisson_large = None
+
+
 # pylint: disable=too-few-public-methods
 class SensorFactory:
     """
@@ -172,6 +197,7 @@ class Sensor(ABC, ConfigurationMixin):
         self.roi_shape: list[int]
         self.number_measurements: int = 2
         self.target_data_type: type
+        self._frame_buffer: Optional[np.ndarray] = None
         self.attribute_map = {
             "number_measurements": lambda x: setattr(self, "number_measurements", x),
             "target_data_type": lambda x: setattr(self, "target_data_type", x),
@@ -190,6 +216,11 @@ class Sensor(ABC, ConfigurationMixin):
         Returns measurements in an array of shape
         [self.number_measurements, \\*self.roi_shape].
 
+        The returned array may be owned by the sensor (see
+        :meth:`_get_frame_buffer`): it is only valid until the next call
+        and is then overwritten in place. Callers that keep the data
+        beyond the next acquisition, e.g. in a list, must copy it.
+
         :param synchroniser: Synchronisers instance.
          Sensor and Synchroniser are in most cases the devices that
          need the most amount of configuration. To avoid problems
@@ -200,6 +231,39 @@ class Sensor(ABC, ConfigurationMixin):
         :type synchroniser: Optional[Synchroniser]
         """
 
+    def acquire_data_stream(
+        self, synchroniser: Optional[Synchroniser] = None, chunk: int = 32
+    ) -> Iterator[np.ndarray]:
+        """
+        Streaming counterpart of :meth:`acquire_data`. Yields the
+        measurements in consecutive blocks of at most ``chunk`` frames,
+        so that consumers can start processing before the full
+        acquisition is in memory.
+
+        The default implementation acquires everything with
+        :meth:`acquire_data` and yields views into the result. Sensors
+        that can produce data incrementally override this.
+
+        :param synchroniser: See :meth:`acquire_data`.
+        :type synchroniser: Optional[Synchroniser]
+        :param chunk: Maximum number of frames per yielded block.
+        :type chunk: int
+        """
+        data = self.acquire_data(synchroniser)
+        for start in range(0, len(data), chunk):
+            yield data[start : start + chunk]
+
+    def _get_frame_buffer(self, shape: Tuple[int, ...], dtype: type) -> np.ndarray:
+        """
+        Returns the sensor owned output buffer, reallocating it only if
+        shape or dtype differ from the previous request.
+        """
+        buffer = self._frame_buffer
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = np.empty(shape, dtype=dtype)
+            self._frame_buffer = buffer
+        return buffer
+
     @abstractmethod
     def close(self) -> None:
         """
@@ -456,6 +520,8 @@ class GenICamHarvester(Sensor):
     """
 
     def __init__(self, configuration: Dict[str, Any]) -> None:
+        from harvesters.core import Harvester
+
         self.harvester = Harvester()
         self.cti_file = configuration["GenTL_producer_cti"]
         try:
@@ -479,10 +545,7 @@ class GenICamHarvester(Sensor):
         self.cam.remote_device.node_map.OffsetY.value = 0
         self.cam.remote_device.node_map.Height.value = 800
         self.cam.remote_device.node_map.Width.value = 1200
-        self.roi_shape = [
-            self.cam.remote_device.node_map.Height.value,
-            self.cam.remote_device.node_map.Width.value,
-        ]
+        self._cache_roi_dimensions()
         self.attribute_map["exposure_time"] = self._set_exposure_time
         self.attribute_map["image_roi"] = self._set_roi
         self.attribute_map["gain"] = self._set_gain
@@ -537,7 +600,7 @@ class GenICamHarvester(Sensor):
             self.cam.remote_device.node_map.Width.value = roi_shape_h_and_w[1]
             self.cam.remote_device.node_map.OffsetX.value = roi_offset_x_and_y[0]
             self.cam.remote_device.node_map.OffsetY.value = roi_offset_x_and_y[1]
-            self.roi_shape = roi_shape_h_and_w
+            self._cache_roi_dimensions()
             logging.info(
                 "Set Sensor roi to height: {} and width: {}\n\
                           with offset X: {} and Y: {}".format(
@@ -565,15 +628,24 @@ class GenICamHarvester(Sensor):
             )
             raise exc
 
+    def _cache_roi_dimensions(self) -> None:
+        """
+        Reads the ROI back from the camera once and stores it.
+        Every ``node_map`` access is a GenTL round-trip, so
+        :meth:`acquire_data` uses the cached values instead.
+        """
+        self._h = self.cam.remote_device.node_map.Height.value
+        self._w = self.cam.remote_device.node_map.Width.value
+        self.roi_shape = [self._h, self._w]
+
     def acquire_data(self, synchroniser: Optional[Synchroniser] = None) -> np.ndarray:
         """
         See :meth:`Sensor.acquire_data`.
         """
         time_1 = time()
-        height = self.cam.remote_device.node_map.Height.value
-        width = self.cam.remote_device.node_map.Width.value
+        height, width = self._h, self._w
         self.cam.start()
-        data = np.zeros((self.number_measurements, height * width), dtype=np.uint32)
+        data = np.empty((self.number_measurements, height * width), dtype=np.uint32)
         if synchroniser is not None:
             synchroniser.trigger()
         for _i in range(20):
@@ -641,6 +713,8 @@ class BaslerCam(Sensor):
     """
 
     def __init__(self, configuration: Dict[str, Any]) -> None:
+        from pypylon import pylon
+
         self.cam = pylon.InstantCamera(
             pylon.TlFactory.GetInstance().CreateFirstDevice()
         )
@@ -693,17 +767,18 @@ class BaslerCam(Sensor):
         """
         See :meth:`Sensor.acquire_data`.
         """
+        from pypylon import pylon
+
         time_1 = time()
-        arr = np.zeros((self.number_measurements, *self.roi_shape))
-        self.cam.StartGrabbingMax(self.number_measurements)
+        number_measurements = self.number_measurements
+        arr = np.empty((number_measurements, *self.roi_shape), dtype=np.uint16)
+        timeout_handling = pylon.TimeoutHandling_ThrowException
+        self.cam.StartGrabbingMax(number_measurements)
         if synchroniser is not None:
             synchroniser.trigger()
-        for i in range(self.number_measurements):
-            grab_result = self.cam.RetrieveResult(
-                int(5000), pylon.TimeoutHandling_ThrowException
-            )
-            frame = np.asarray(grab_result.Array)
-            arr[i] = frame
+        for i in range(number_measurements):
+            grab_result = self.cam.RetrieveResult(5000, timeout_handling)
+            arr[i] = grab_result.Array
             grab_result.Release()
         time_2 = time()
         logging.info(
@@ -855,6 +930,8 @@ class HeliCam(Sensor):
         self.initial_configuration_dict = configuration
         if configuration is not None:
             self._update_from_configuration(configuration)
+        import libHeLIC as heli
+
         self.he_sys = heli.LibHeLIC()
         self.roi_shape = [300, 300]
 
@@ -881,6 +958,8 @@ class HeliCam(Sensor):
         Opens the camera and loads the firmware.
         Flushes the camera buffer, and sets the cameras attribute map.
         """
+        import libHeLIC as heli
+
         self.he_sys.Open(0, sys="c3cam_sl70")
         res = 1
         while res > 0:
@@ -899,6 +978,8 @@ class HeliCam(Sensor):
 
         See :meth:`Sensor.acquire_data`.
         """
+        import libHeLIC as heli
+
         time_1 = time()
         if synchroniser is not None:
             synchroniser.trigger()
@@ -914,10 +995,11 @@ class HeliCam(Sensor):
         data = heli.LibHeLIC.Ptr2Arr(
             data, (self.settings["SensNFrames"], 300, 300, 2), heli.ct.c_ushort
         )
-        raw_frames = np.asarray((data), dtype="int32")
-        return_frames = np.zeros((2 * self.settings["SensNFrames"], 300, 300))
-        return_frames[::2] = raw_frames[:, :, :, 0]
-        return_frames[1::2] = raw_frames[:, :, :, 1]
+        raw_frames = np.asarray(data)
+        return_frames = np.empty(
+            (2 * self.settings["SensNFrames"], 300, 300), dtype=np.float64
+        )
+        _deinterleave(raw_frames, return_frames)
         time_2 = time()
         logging.info(
             f"HeliCam C3 data acquisition took {time_2-time_1} s".ljust(65, ".")
@@ -1006,11 +1088,15 @@ class DAQ(Sensor):
         sample clock and start trigger.
         """
         try:
-            self.NsampsPerDAQread: float = self.number_measurements
+            import nidaqmx
+            from nidaqmx.stream_readers import AnalogSingleChannelReader
+
+            self.NsampsPerDAQread: int = int(self.number_measurements)
             self.daq_task = nidaqmx.Task()
             self._create_analog_input_channel()
             self._configure_sample_clock()
             self._configure_analog_input_trigger()
+            self._daq_reader = AnalogSingleChannelReader(self.daq_task.in_stream)
             logging.info("DAQ opened and created read task".ljust(65, "."))
         except Exception:
             self.close()
@@ -1022,6 +1108,8 @@ class DAQ(Sensor):
             )
 
     def _create_analog_input_channel(self) -> None:
+        from nidaqmx.constants import TerminalConfiguration, VoltageUnits
+
         # create analog channel to measure voltage
         _ = self.daq_task.ai_channels.add_ai_voltage_chan(
             self.daq_apd_input,
@@ -1033,6 +1121,8 @@ class DAQ(Sensor):
         )
 
     def _configure_analog_input_trigger(self) -> None:
+        from nidaqmx.constants import Edge
+
         # Configure convert clock
         # Specifies the terminal of the signal to use
         # as the AI Convert Clock.
@@ -1044,6 +1134,8 @@ class DAQ(Sensor):
         read_start_trig.cfg_dig_edge_start_trig(self.daq_start_trig, Edge.RISING)
 
     def _configure_sample_clock(self) -> None:
+        from nidaqmx.constants import AcquisitionType, Edge
+
         # Configure sample clock : Sets the clock source, the clock rate,
         # active clock edge, sample mode and the number of
         # samples to acquire.
@@ -1054,17 +1146,29 @@ class DAQ(Sensor):
             AcquisitionType.FINITE,
             self.NsampsPerDAQread,
         )
+        # The stream reader fills this buffer in place on every read.
+        # It is kept across open/close cycles as long as the number of
+        # samples does not change.
+        self._get_frame_buffer((self.NsampsPerDAQread, 1), np.float64)
 
     def acquire_data(self, synchroniser: Optional[Synchroniser] = None) -> np.ndarray:
         """
         Reads all samples at onec from the configure sensor.
+        The samples are read directly into an internal buffer of shape
+        ``[NsampsPerDAQread, 1]``, which is returned and refilled on
+        the next call.
 
         See :meth:`Sensor.acquire_data`.
         """
+        frame = self._get_frame_buffer((self.NsampsPerDAQread, 1), np.float64)
         if synchroniser is not None:
             synchroniser.trigger()
         try:
-            samples = self.daq_task.read(self.NsampsPerDAQread, self.daq_timeout)
+            self._daq_reader.read_many_sample(
+                frame[:, 0],
+                number_of_samples_per_channel=self.NsampsPerDAQread,
+                timeout=self.daq_timeout,
+            )
         except Exception as excpt:
             print(
                 """Error: could not read DAQ.
@@ -1075,7 +1179,7 @@ class DAQ(Sensor):
                 excpt,
             )
             sys.exit()
-        return np.asarray(samples).reshape((len(samples), 1))
+        return frame
 
     def _set_min_voltage(self, min_voltage: float) -> None:
         self.min_voltage = float(min_voltage)
@@ -1122,8 +1226,11 @@ class MockCam(Sensor):
               the following format: [height, width, x_offset, y_offset].
               The roi_shape attribute of the :class:`Sensor` base class will
               be derived from this.
-
-          Possible configuration values:
+            - **seed** (int): Seed for the random number generator producing
+              the mock data. Use this to get reproducible noise on a given
+              machine (the noise is generated by up to 8 worker threads,
+              depending on the number of CPUs). Seeded cameras always use
+              the numpy generators, even if numba is installed.
 
           Note that these configuration attributes extend those from the
           :class:`Sensor` base class.
@@ -1132,7 +1239,14 @@ class MockCam(Sensor):
     def __init__(self, configuration: Dict[str, Any]) -> None:
         super().__init__(configuration)
         self.roi_shape = [200, 200]
+        # One independent generator per worker thread. numpy's generators
+        # release the GIL while sampling, so the workers run in parallel.
+        self._n_workers = min(8, os.cpu_count() or 1)
+        self._rngs = self._spawn_generators(None)
+        self._seeded = False
+        self._pool: Optional[ThreadPoolExecutor] = None
         self.attribute_map["image_roi"] = self._set_roi
+        self.attribute_map["seed"] = self._set_seed
         self.initial_configuration_dict = configuration
         if configuration is not None:
             self._update_from_configuration(configuration)
@@ -1147,29 +1261,99 @@ class MockCam(Sensor):
         self.roi_shape = roi_shape_and_offset[:2]
         _ = roi_shape_and_offset[2:]
 
+    def _set_seed(self, seed: int) -> None:
+        self._rngs = self._spawn_generators(seed)
+        self._seeded = True
+
+    def _spawn_generators(self, seed: Optional[int]) -> List[np.random.Generator]:
+        return [
+            np.random.default_rng(child)
+            for child in np.random.SeedSequence(seed).spawn(self._n_workers)
+        ]
+
     def open(self) -> None:
         """
-        passes since there is no device to open.
+        There is no device to open. Only allocates the output buffer
+        for the configured number of measurements and roi.
         """
+        self._get_frame_buffer(self._frame_shape(), np.uint16)
+
+    def _frame_shape(self) -> Tuple[int, int, int]:
+        return (self.number_measurements, self.roi_shape[0], self.roi_shape[1])
 
     def acquire_data(self, synchroniser: Optional[Synchroniser] = None) -> np.ndarray:
         """
         Sends tigger signal to synchroniser if there is one.
         Returns an array of shape ``[number_measrurements, height, witdh]``
         as specified in configuration. Array contains Poisson distributed values
-        with k=15000
+        with k=15000, stored as uint16. Values are capped at 65535, which
+        is far above anything drawn for this mean. If numba is installed
+        and no seed is configured, the samples are drawn in parallel from
+        the normal approximation of the Poisson distribution.
+
+        The returned array is an internal buffer that is refilled on the
+        next call.
 
         See :meth:`Sensor.acquire_data`.
         """
         if synchroniser is not None:
             synchroniser.trigger()
-        noise = np.random.poisson(
-            15_000,
-            size=(self.number_measurements, self.roi_shape[0], self.roi_shape[1]),
-        )
-        return noise
+        frames = self._get_frame_buffer(self._frame_shape(), np.uint16)
+        self._fill_noise(frames)
+        return frames
+
+    def acquire_data_stream(
+        self, synchroniser: Optional[Synchroniser] = None, chunk: int = 32
+    ) -> Iterator[np.ndarray]:
+        """
+        Generates the mock data block by block into a single buffer of
+        ``chunk`` frames, so peak memory does not grow with
+        number_measurements. Every yielded array is a view into that
+        buffer and is overwritten by the next block.
+
+        See :meth:`Sensor.acquire_data_stream`.
+        """
+        if synchroniser is not None:
+            synchroniser.trigger()
+        chunk = min(chunk, self.number_measurements)
+        buf = np.empty((chunk, self.roi_shape[0], self.roi_shape[1]), dtype=np.uint16)
+        for start in range(0, self.number_measurements, chunk):
+            block = buf[: min(chunk, self.number_measurements - start)]
+            self._fill_noise(block)
+            yield block
+
+    def _fill_noise(self, out: np.ndarray) -> None:
+        if _fill_poisson_large is not None and not self._seeded:
+            _fill_poisson_large(out, 15_000.0)
+            return
+        # Split the frames into one contiguous block per generator.
+        bounds = np.linspace(0, len(out), len(self._rngs) + 1).astype(int)
+        jobs = [
+            (rng, out[start:stop])
+            for rng, start, stop in zip(self._rngs, bounds[:-1], bounds[1:])
+            if stop > start
+        ]
+        if len(jobs) == 1:
+            self._fill_poisson(*jobs[0])
+            return
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self._n_workers)
+        list(self._pool.map(lambda job: self._fill_poisson(*job), jobs))
+
+    @staticmethod
+    def _fill_poisson(rng: np.random.Generator, out: np.ndarray) -> None:
+        # Generator.poisson has no ``out`` argument. Drawing one frame at a
+        # time keeps the temporary int64 array at the size of a single frame.
+        for frame in out:
+            draw = rng.poisson(15_000, size=frame.shape)
+            np.minimum(draw, 65535, out=draw)
+            frame[...] = draw
 
     def close(self) -> None:
         """
-        Passes since there is no device to close.
+        There is no device to close. Only shuts down the worker threads
+        used to generate the noise.
         """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
@@ -1,26 +1,156 @@
-# pylint: disable=logging-format-interpolation
-# pylint: disable=logging-not-lazy
+# pylint: disable=import-outside-toplevel
 """
 Create all controlls for microwave sources.
 """
 import logging
+import os
+import queue
+import sys
+import threading
 import traceback
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from functools import lru_cache
 from time import sleep
-from typing import Dict, Any, Union, Tuple, List
-import serial
-from windfreak import SynthHD
-from pydantic import validate_call
+from typing import (
+    Callable,
+    Dict,
+    Any,
+    Iterator,
+    Optional,
+    Union,
+    Tuple,
+    List,
+    Sequence,
+    cast,
+)
+import numpy as np
+from pydantic import TypeAdapter, validate_call
 from qupyt.hardware import visa_handler
 from qupyt.mixins import UpdateConfigurationType, ConfigurationMixin, ConfigurationError
 from qupyt.utils.decorators import coerce_device_config_shape, loop_inputs
 
+logger = logging.getLogger(__name__)
+
 ParameterInput = Union[
     Union[float, int, str],
     Tuple[str, Union[float, int, str]],
     List[Tuple[str, Union[float, int, str]]],
 ]
 
+_parameter_input_adapter = TypeAdapter(ParameterInput)
+
+# A single (channel, value) item as loop_inputs passes it to the setters,
+# after validation and with numeric strings converted to float.
+_ChannelValue = Tuple[str, float]
+
+
+@lru_cache(maxsize=512)
+def _pad(label: str) -> str:
+    """Log label padded with dots to the usual status column."""
+    return label.ljust(65, ".")
+
+
+def _scpi_list(values: Sequence[float], unit: str) -> str:
+    """
+    Formats a list of values as the comma separated argument of an SCPI
+    list command, e.g. ``"2870000000.0 Hz,2880000000.0 Hz"``.
+    """
+    return ",".join([f"{value} {unit}" for value in values])
+
+
+def _as_float(param: str, value: Any) -> float:
+    """
+    Converts a setter input to float. Raises ConfigurationError for
+    input that cannot be sent to the device as a number.
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ConfigurationError(param, value, ["a number"]) from None
+
+
+def _as_int(param: str, value: Any) -> int:
+    """
+    Converts a setter input to int. Raises ConfigurationError for input
+    that is not a whole number, instead of truncating it.
+    """
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        number = float("nan")
+    if not number.is_integer():
+        raise ConfigurationError(param, value, ["an integer"])
+    return int(number)
+
+
+def _set_low_latency(address: str) -> None:
+    """
+    Lowers the latency timer of USB serial adapters (e.g. FTDI) to 1 ms
+    on Linux. The default of 16 ms is added to every short response.
+    Ports without a latency timer, other platforms and missing write
+    permissions are skipped silently.
+    """
+    if not sys.platform.startswith("linux"):
+        return
+    path = os.path.join(
+        "/sys/bus/usb-serial/devices", os.path.basename(address), "latency_timer"
+    )
+    try:
+        with open(path, "w", encoding="ascii") as latency_timer:
+            latency_timer.write("1")
+    except OSError:
+        logger.debug("Could not set the latency timer of %s", address)
+
+
+def _canonicalize_parameter_input(
+    value: Any,
+) -> List[Tuple[str, Union[float, int, str]]]:
+    """
+    Validates a configuration value against :data:`ParameterInput` and
+    brings it into the ``[(channel, value), ...]`` shape the setters work
+    on. Validation happens here, once per configuration, instead of on
+    every setter call.
+
+    Raises:
+        pydantic.ValidationError
+    """
+    value = _parameter_input_adapter.validate_python(value)
+    if isinstance(value, list):
+        return value
+    if isinstance(value, tuple):
+        return [value]
+    return [("channel_1", value)]
+
+
+# Maps every supported device_type to a constructor taking the full
+# device_info dictionary. The VISA devices without a dedicated class
+# use the generic VisaSignalSource.
+_DEVICE_CONSTRUCTORS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "WindFreak": lambda info: WindFreakOfficial(info["address"], info["config"]),
+    "WindFreakHDM": lambda info: WindFreakHDM(info["address"], info["config"]),
+    "WindFreakSNV": lambda info: WindFreakSNV(info["address"], info["config"]),
+    "WindFreakSHDMini": lambda info: WindFreakSHDMini(info["address"], info["config"]),
+    "Mock": lambda info: MockSignalSource(
+        info["address"], info["config"], info.get("delay")
+    ),
+    "SMB": lambda info: SMBVisaSignalSource(
+        info["address"], info["device_type"], info["config"]
+    ),
+    "Rigol": lambda info: RigolSignalSource(
+        info["address"], info["device_type"], info["config"]
+    ),
+    "SRS": lambda info: VisaSignalSource(
+        info["address"], info["device_type"], info["config"]
+    ),
+    "TekAWG": lambda info: VisaSignalSource(
+        info["address"], info["device_type"], info["config"]
+    ),
+    "TekAFG": lambda info: VisaSignalSource(
+        info["address"], info["device_type"], info["config"]
+    ),
+}
+
 # pylint: disable=too-few-public-methods
 
 
@@ -64,100 +194,138 @@ class DeviceFactory:
         :rtype:
         :raises ConfigurationError:
         """
-        known_devices = [
-            "WindFreak",
-            "WindFreakHDM",
-            "Mock",
-            "SRS",
-            "SMB",
-            "Rigol",
-            "TekAWG",
-            "TekAFG",
-            "WindFreakSNV",
-            "WindFreakSHDMini"
-        ]
-        if device_info["device_type"] not in known_devices:
+        device_type = device_info["device_type"]
+        constructor = _DEVICE_CONSTRUCTORS.get(device_type)
+        if constructor is None:
             raise ConfigurationError(
-                "the device type", device_info["device_type"], known_devices
+                "the device type", device_type, list(_DEVICE_CONSTRUCTORS)
             )
         try:
-            if device_info["device_type"] == "WindFreakSNV":
-                return WindFreakSNV(device_info["address"], device_info["config"])
-            if device_info["device_type"] == "WindFreakHDM":
-                return WindFreakHDM(device_info["address"], device_info["config"])
-            if device_info["device_type"] == "WindFreak":
-                return WindFreakOfficial(device_info["address"], device_info["config"])
-            if device_info["device_type"] == "WindFreakSHDMini":
-                return WindFreakSHDMini(device_info["address"], device_info["config"])
-            if device_info["device_type"] == "Mock":
-                return MockSignalSource(device_info["address"], device_info["config"])
-            if device_info["device_type"] == "SMB":
-                return SMBVisaSignalSource(
-                    device_info["address"],
-                    device_info["device_type"],
-                    device_info["config"],
-                )
-            if device_info["device_type"] == "Rigol":
-                return RigolSignalSource(
-                    device_info["address"],
-                    device_info["device_type"],
-                    device_info["config"],
-                )
-            return VisaSignalSource(
-                device_info["address"],
-                device_info["device_type"],
-                device_info["config"],
-            )
-
+            return constructor(device_info)
         except Exception as exc:
-            logging.exception(
-                "Could not open desired camera".ljust(65, ".") + "[failed]"
-            )
+            logger.exception("%s[failed]", _pad("Could not open desired device"))
             traceback.print_exc()
             raise exc
 
 
 class SignalSource(ABC, ConfigurationMixin):
     attribute_map: UpdateConfigurationType
+    # Configuration keys whose values are validated as ParameterInput
+    # when the configuration is set, see _validate_configuration.
+    validated_parameters = ("frequency", "amplitude")
 
     def __init__(self, configuration: Dict[str, Any]) -> None:
         # pylint: disable=unused-argument
         # configuration is not used in the ABC, however
         # all child classes must take it as input.
-        self.configuration = configuration
+        self.configuration = self._validate_configuration(configuration)
         self.attribute_map = {
             "frequency": self.set_frequency,
             "amplitude": self.set_amplitude,
         }
+        # Last values written per channel. Sources whose setters are
+        # idempotent use these to skip writes that would not change anything.
+        # Setters take force=True to write regardless.
+        # The WindFreak serial sources store frequencies as sent, i.e. in MHz
+        # after rounding to the device resolution.
+        self._last_freq: Dict[str, float] = {}
+        self._last_mhz: Dict[str, float] = {}
+        self._last_ampl: Dict[str, float] = {}
 
     @abstractmethod
-    def set_frequency(self, freq: ParameterInput) -> None:
+    def set_frequency(self, freq: ParameterInput, force: bool = False) -> None:
         """
         Force all Signal Sources to implement a way to
         set its output frequency.
+        Sources may skip the write if the channel is already set to
+        this value. Pass ``force=True`` to always write.
         """
 
     @abstractmethod
-    def set_amplitude(self, ampl: ParameterInput) -> None:
+    def set_amplitude(self, ampl: ParameterInput, force: bool = False) -> None:
         """
         Force all Signal Sources to implement a way to
         set its output amplitude.
         Not all devices use the same units. However, wherever practically
         possible amplitudes will be interpreted in units of dBm.
+        Sources may skip the write if the channel is already set to
+        this value. Pass ``force=True`` to always write.
         """
 
+    def sweep(self, freqs: Sequence[float], channel: int = 1) -> Iterator[float]:
+        """
+        Steps through frequencies in Hz, yielding each frequency once it
+        is set so the caller can measure inside the loop. Subclasses
+        override this with faster paths where the device allows it.
+
+        Example:
+            >>> for freq in source.sweep(np.linspace(2.8e9, 2.9e9, 101)):
+            ...     data.append(sensor.acquire_data().copy())
+        """
+        set_frequency = self.set_frequency
+        channel_key = f"channel_{channel}"
+        for freq in np.asarray(freqs, dtype=np.float64).tolist():
+            set_frequency((channel_key, freq))
+            yield freq
+
+    def clear_cache(self) -> None:
+        """
+        Forgets the last written values, e.g. after the device was reset.
+        The next call to every setter writes to the device.
+        """
+        self._last_freq.clear()
+        self._last_mhz.clear()
+        self._last_ampl.clear()
+
     def set_values(self) -> None:
         if self.configuration is not None:
             self._update_from_configuration(self.configuration)
 
     def update_configuration(self, config: Dict[str, Any]) -> None:
-        setattr(self, "configuration", config)
+        setattr(self, "configuration", self._validate_configuration(config))
+
+    def _validate_configuration(
+        self, config: Optional[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        if config is None:
+            return None
+        return {
+            key: (
+                _canonicalize_parameter_input(value)
+                if key in self.validated_parameters
+                else value
+            )
+            for key, value in config.items()
+        }
 
 
 class MockSignalSource(SignalSource):
-    def __init__(self, address: str, configuration: Dict[str, Any]) -> None:
+    """
+    Mock signal source that does not talk to any hardware.
+    Setters only log the requested values.
+
+    Set ``mock_latency_s`` (float, seconds) in the configuration to make
+    every setter call sleep, simulating the delay of a real device.
+    The delay can also be given as ``delay`` in the device description
+    (forwarded by the :class:`DeviceFactory`) or through the
+    ``QUPYT_MOCK_DELAY`` environment variable. The configuration takes
+    precedence. By default setters return immediately.
+    """
+
+    def __init__(
+        self,
+        address: str,
+        configuration: Dict[str, Any],
+        delay: Optional[float] = None,
+    ) -> None:
         self.address = address
         super().__init__(configuration)
+        if delay is None:
+            delay = float(os.environ.get("QUPYT_MOCK_DELAY", 0.0))
+        self._mock_latency = float(delay)
+        if configuration and "mock_latency_s" in configuration:
+            self._mock_latency = float(configuration["mock_latency_s"])
+        self.attribute_map["mock_latency_s"] = self._set_mock_latency
 
     def __repr__(self) -> str:
         return f"MockSignalSource(address: {self.address})"
@@ -165,25 +333,32 @@ class MockSignalSource(SignalSource):
     def __str__(self) -> str:
         return f"Signal source of type MockSignalSource(address: {self.address})"
 
-    @validate_call
     @coerce_device_config_shape
     @loop_inputs
-    def set_frequency(self, freq: ParameterInput) -> None:
-        channel, freq = freq
-        sleep(0.1)
-        logging.info(
-            f"MOCKING! -> set frequency channel {channel} to".ljust(65, ".") + f"{freq}"
-        )
+    def set_frequency(self, freq: ParameterInput, force: bool = False) -> None:
+        # pylint: disable=unused-argument
+        channel, freq = cast(_ChannelValue, freq)
+        if self._mock_latency:
+            sleep(self._mock_latency)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "%s%s", _pad(f"MOCKING! -> set frequency channel {channel} to"), freq
+            )
 
-    @validate_call
     @coerce_device_config_shape
     @loop_inputs
-    def set_amplitude(self, ampl: ParameterInput) -> None:
-        channel, ampl = ampl
-        sleep(0.1)
-        logging.info(
-            f"MOCKING! -> set amplitued channel {channel} to".ljust(65, ".") + f"{ampl}"
-        )
+    def set_amplitude(self, ampl: ParameterInput, force: bool = False) -> None:
+        # pylint: disable=unused-argument
+        channel, ampl = cast(_ChannelValue, ampl)
+        if self._mock_latency:
+            sleep(self._mock_latency)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "%s%s", _pad(f"MOCKING! -> set amplitued channel {channel} to"), ampl
+            )
+
+    def _set_mock_latency(self, mock_latency_s: float) -> None:
+        self._mock_latency = float(mock_latency_s)
 
     def close(self) -> None:
         pass
@@ -201,31 +376,99 @@ class VisaSignalSource(visa_handler.VisaObject, SignalSource):
         self.address = address
         visa_handler.VisaObject.__init__(self, address, device_type)
         SignalSource.__init__(self, configuration)
+        # Setter commands per channel, resolved once instead of building
+        # the command key on every call.
+        self._set_freq_cmds = self._channel_commands("SetFreq")
+        self._set_ampl_cmds = self._channel_commands("SetAmpl")
+
+    def _channel_commands(self, prefix: str) -> Dict[str, str]:
+        """
+        Maps the channel, as passed on by loop_inputs, to the command
+        with the given prefix, e.g. ``{"1": "FREQ "}`` for "SetFreq".
+        """
+        return {
+            key[len(prefix) :]: cmd
+            for key, cmd in self.command.items()
+            if key.startswith(prefix) and key[len(prefix) :].isdigit()
+        }
+
+    def set_values(self) -> None:
+        """
+        Applies the configuration, waiting for the device only once
+        after all values have been written.
+        """
+        with self.deferred_opc():
+            SignalSource.set_values(self)
 
-    @validate_call
     @coerce_device_config_shape
     @loop_inputs
-    def set_amplitude(self, ampl: ParameterInput) -> None:
-        channel, ampl = ampl
-        self.instance.write(self.command[f"SetAmpl{channel}"] + str(ampl))
+    def set_amplitude(self, ampl: ParameterInput, force: bool = False) -> None:
+        channel, ampl = cast(_ChannelValue, ampl)
+        if not force and self._last_ampl.get(channel) == ampl:
+            return
+        self.write_cmd(self._set_ampl_cmds[channel] + str(ampl))
         self.opc_wait()
-        logging.info(
-            f"{self.s_type} set amplitude channel {channel} to".ljust(65, ".")
-            + f"{ampl}"
-        )
+        self._last_ampl[channel] = ampl
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "%s%s", _pad(f"{self.s_type} set amplitude channel {channel} to"), ampl
+            )
 
-    @validate_call
     @coerce_device_config_shape
     @loop_inputs
-    def set_frequency(self, freq: ParameterInput) -> None:
-        channel, freq = freq
-        self.instance.write(self.command[f"SetFreq{channel}"] + str(freq))
+    def set_frequency(self, freq: ParameterInput, force: bool = False) -> None:
+        channel, freq = cast(_ChannelValue, freq)
+        if not force and self._last_freq.get(channel) == freq:
+            return
+        self.write_cmd(self._set_freq_cmds[channel] + str(freq))
         self.opc_wait()
-        logging.info(
-            f"{self.s_type} set frequency channel {channel} to".ljust(65, ".")
-            + f"{freq}"
+        self._last_freq[channel] = freq
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "%s%s", _pad(f"{self.s_type} set frequency channel {channel} to"), freq
+            )
+
+    def set_frequency_list(self, freqs: Sequence[float], channel: int = 1) -> None:
+        """
+        Sends a whole list of frequencies in Hz in a single write, for
+        devices that step through a frequency list on a trigger. The list
+        mode itself has to be configured separately, see e.g.
+        :class:`SMBVisaSignalSource`.
+
+        Raises:
+            ConfigurationError: if the device has no frequency list.
+        """
+        key = f"SetFreqList{channel}"
+        if key not in self.command:
+            raise ConfigurationError(
+                "a frequency list",
+                f"{self.s_type} channel {channel}",
+                ["SMB channel 1"],
+            )
+        # Plain floats format faster than numpy scalars.
+        freq_values = np.asarray(freqs, dtype=np.float64).tolist()
+        self.write_cmd(self.command[key] + _scpi_list(freq_values, "Hz"))
+        self.opc_wait()
+        logger.info(
+            "%s%s",
+            _pad(f"{self.s_type} set frequency list of length"),
+            len(freq_values),
         )
 
+    def sweep(self, freqs: Sequence[float], channel: int = 1) -> Iterator[float]:
+        """
+        See :meth:`SignalSource.sweep`. Resolves the command once and
+        writes every point directly, bypassing the setter decorators.
+        """
+        key = str(channel)
+        cmd_key = f"SetFreq{key}"
+        for freq in np.asarray(freqs, dtype=np.float64).tolist():
+            if self._last_freq.get(key) != freq:
+                self.write_value(cmd_key, freq)
+                self.opc_wait()
+                self._last_freq[key] = freq
+            yield freq
+
 
 class RigolSignalSource(VisaSignalSource):
     """Special class for Rigol DG1022 to enable gating"""
@@ -245,13 +488,13 @@ class RigolSignalSource(VisaSignalSource):
         if mode.lower() not in valids:
             raise ConfigurationError("Burst mode", mode, valids)
         if mode.lower() == "off":
-            self.instance.write(self.command[f"SetBurstState{channel}"] + "OFF")
+            self.write_cmd(self.command[f"SetBurstState{channel}"] + "OFF")
         if mode.lower() == "gate":
-            self.instance.write(self.command[f"SetBurstState{channel}"] + "ON")
-            self.instance.write(self.command[f"SetBurstMode{channel}"] + "GAT")
+            self.write_cmd(self.command[f"SetBurstState{channel}"] + "ON")
+            self.write_cmd(self.command[f"SetBurstMode{channel}"] + "GAT")
 
 
-class SMBVisaSignalSource(visa_handler.VisaObject, SignalSource):
+class SMBVisaSignalSource(VisaSignalSource):
     """
     SignaSource implementation for devices that implement
     the VISA protocol and configure a switchable frequency list
@@ -260,216 +503,381 @@ class SMBVisaSignalSource(visa_handler.VisaObject, SignalSource):
     def __init__(
         self, address: str, device_type: str, configuration: Dict[str, Any]
     ) -> None:
-        self.address = address
         self.slist_frequencies: List[float] = []
         self.slist_amplitudes: List[float] = []
-        visa_handler.VisaObject.__init__(self, address, device_type)
-        SignalSource.__init__(self, configuration)
+        super().__init__(address, device_type, configuration)
         self.attribute_map["slits_frequencies"] = self._set_slist_frequencies
         self.attribute_map["slits_amplitudes"] = self._set_slist_amplitudes
 
     def _set_slist_frequencies(self, slist_frequencies: List[float]) -> None:
         self.slist_frequencies = slist_frequencies
-        if len(self.slist_frequencies) != 0 and (
-            len(self.slist_amplitudes) == len(self.slist_amplitudes)
-        ):
+        if self._slist_complete():
             self._configure_slist()
 
     def _set_slist_amplitudes(self, slist_amplitudes: List[float]) -> None:
         self.slist_amplitudes = slist_amplitudes
-        if len(self.slist_amplitudes) != 0 and (
-            len(self.slist_amplitudes) == len(self.slist_amplitudes)
-        ):
+        if self._slist_complete():
             self._configure_slist()
 
+    def _slist_complete(self) -> bool:
+        """
+        The list is only sent once frequencies and amplitudes have been
+        set and describe the same number of list entries.
+        """
+        return len(self.slist_frequencies) != 0 and len(
+            self.slist_frequencies
+        ) == len(self.slist_amplitudes)
+
     def _configure_slist(self) -> None:
-        self.instance.write("*RST")
-        self.opc_wait()
-        self.instance.write("OUTP ON")
-        self.opc_wait()
-        self.instance.write("SOURce1:FREQ:MODE CW")
-        self.opc_wait()
-        # select/create list
-        self.instance.write('SOURce1:LIST:SEL "SyncList"')
-        self.opc_wait()
+        # The whole setup is sent as SCPI compound commands with a single
+        # OPC query at the end instead of one round trip per command.
+        # reset, enable output and select/create list
+        self.write_cmd(
+            '*RST;:OUTP ON;:SOURce1:FREQ:MODE CW;:SOURce1:LIST:SEL "SyncList"'
+        )
+        # *RST discards the values set through the setters.
+        self.clear_cache()
 
         # write frequency to list first row in arg first one being the NV
         # second one the overhauser-frequency
-        set_slist_frequencies = f"SOURce1:LIST:FREQ {self.slist_frequencies[0]} Hz"
-        for slist_freq in self.slist_frequencies:
-            set_slist_frequencies += f", {slist_freq} Hz"
-        self.instance.write(set_slist_frequencies)
-        self.opc_wait()
+        self.write_cmd(
+            self.command["SetFreqList1"] + _scpi_list(self.slist_frequencies, "Hz")
+        )
 
         # write amp to list first row in arg first one being the NV
         # second one the overhauser-amp
-        set_slist_amplitudes = f"SOURce1:LIST:POW {self.slist_amplitudes[0]} dBm"
-        for slist_ampl in self.slist_amplitudes:
-            set_slist_amplitudes += f", {slist_ampl} dBm"
-        self.instance.write(set_slist_amplitudes)
-        self.opc_wait()
+        self.write_cmd(f"SOURce1:LIST:POW {_scpi_list(self.slist_amplitudes, 'dBm')}")
 
-        # set list mode to step not auto
-        self.instance.write("SOURce1:LIST:MODE STEP")
-        self.opc_wait()
-        # set trigger type to external
-        self.instance.write("SOURce1:LIST:TRIG:SOUR EXT")
-        self.opc_wait()
-        self.instance.write("SOURce1:FREQ:MODE LIST")
+        # set list mode to step not auto, trigger type to external
+        # and switch to list mode
+        self.write_cmd(
+            "SOURce1:LIST:MODE STEP;:SOURce1:LIST:TRIG:SOUR EXT;:SOURce1:FREQ:MODE LIST"
+        )
         self.opc_wait()
-        logging.info("%s[done]", "SMB set slist values.".ljust(65, "."))
+        logger.info("%s[done]", _pad("SMB set slist values."))
 
-    @validate_call
-    @coerce_device_config_shape
-    @loop_inputs
-    def set_amplitude(self, ampl: ParameterInput) -> None:
-        channel, ampl = ampl
-        self.instance.write(self.command[f"SetAmpl{channel}"] + str(ampl))
-        self.opc_wait()
-        logging.info(
-            f"{self.s_type} set amplitude channel {channel} to".ljust(65, ".")
-            + f"{ampl}"
-        )
 
-    @validate_call
-    @coerce_device_config_shape
-    @loop_inputs
-    def set_frequency(self, freq: ParameterInput) -> None:
-        channel, freq = freq
-        self.instance.write(self.command[f"SetFreq{channel}"] + str(freq))
-        self.opc_wait()
-        logging.info(
-            f"{self.s_type} set frequency channel {channel} to".ljust(65, ".")
-            + f"{freq}"
-        )
+class WindFreakSerial(SignalSource):
+    """
+    Base class of the WindFreak sources talking to the device through
+    raw serial commands (pyserial, ``self.instance``). The models only
+    differ in their command set. Subclasses set the command class
+    attributes, the frequency resolution and whether commands start with
+    a channel select.
+
+    All commands go through :meth:`_write`. Inside a :meth:`batched`
+    block they are collected and sent in a single serial write.
+
+    Commands are kept as bytes class attributes. Commands taking a value
+    are bytes %-format templates, so no str is built and encoded per call.
+    Values are formatted with a fixed number of decimals matching the
+    device resolution, never in exponent notation.
+
+    Set ``async_writes`` to True in the configuration to hand writes to
+    a background thread, so setters return without waiting for the
+    serial port. :meth:`flush` blocks until all queued writes are sent.
+    :meth:`set_values`, :meth:`query` and :meth:`close` flush implicitly.
+    """
 
+    _NAME = "WindFreak"
+    _CMD_VER = b"v"
+    _CMD_MODEL = b"+"
+    _CMD_POWER = b"h%d"
+    _CMD_OUTPUT = b"o%d"
+    _CMD_AMPL = b"a%.0f"  # steps from 0 to 63
+    _CMD_FREQ = b"f%.1f"
+    # Number of decimals of the frequency in MHz the device resolves.
+    _FREQ_DECIMALS = 1
+    # Amplitude and frequency templates take (channel, value) instead of
+    # value if set.
+    _SELECT_CHANNEL = False
+
+    instance: Any
+    # Commands queued inside a batched() block, None outside of it.
+    _pending: Optional[List[bytes]] = None
 
-class WindFreakSNV(SignalSource):
     def __init__(self, address: str, configuration: Dict[str, Any]) -> None:
         self.address = address
         super().__init__(configuration)
         try:
-            self.instance = serial.Serial(self.address, timeout=1)
-            logging.info(
-                f"Connected to WindFreak on {address}".ljust(65, ".") + "[done]"
-            )
+            self.instance = self._open_serial(self.address)
         except Exception:
-            logging.error(
-                f"Connection to WindFreak on {address} failed".ljust(65, ".")
-                + "[failed]"
+            logger.error(
+                "%s[failed]", _pad(f"Connection to {self._NAME} on {address} failed")
             )
-            traceback.print_exc()
+            raise
+        logger.info("%s[done]", _pad(f"Connected to {self._NAME} on {address}"))
+        # Last power level and output state written, see clear_cache.
+        self._power_level: Optional[Union[float, int, str]] = None
+        self._output_on: Optional[Union[float, int, str]] = None
+        # Queue and thread of the async_writes mode, None when disabled.
+        self._tx_queue: Optional[queue.Queue[Optional[bytes]]] = None
+        self._tx_thread: Optional[threading.Thread] = None
         self._set_power_level(1)
         self.attribute_map["power_level"] = self._set_power_level
         self.attribute_map["output_on_off"] = self._set_output_on_off
+        self.attribute_map["async_writes"] = self._set_async_writes
 
-    def __repr__(self) -> str:
-        return f"WindFreak(address: {self.address})"
+    @staticmethod
+    def _open_serial(address: str) -> Any:
+        """
+        Opens the serial port. The read timeout only bounds reads that
+        get no terminator. Reads return as soon as a response is complete.
+        Writes fail after 200 ms instead of blocking on a stuck port.
+
+        Raises:
+            ConfigurationError: if no such port exists. Checked upfront
+            since opening a missing port can block for a long time on
+            some platforms.
+        """
+        import serial
+        from serial.tools import list_ports
+
+        ports = [port.device for port in list_ports.comports()]
+        # Paths such as /dev/serial/by-id/... are not listed but exist.
+        if address not in ports and not os.path.exists(address):
+            raise ConfigurationError("the serial port", address, ports)
+        _set_low_latency(address)
+        return serial.Serial(
+            address, timeout=0.05, write_timeout=0.2, inter_byte_timeout=0.01
+        )
 
-    def __str__(self) -> str:
-        return f"Signal source of type (synth-nv) WindFreak(address: {self.address})"
+    def _write(self, cmd: bytes) -> None:
+        if self._pending is not None:
+            self._pending.append(cmd)
+        else:
+            self._send(cmd)
+
+    def _send(self, data: bytes) -> None:
+        if self._tx_queue is not None:
+            self._tx_queue.put(data)
+        else:
+            self.instance.write(data)
+
+    def write_batch(self, cmds: List[bytes]) -> None:
+        """
+        Sends several commands in one serial write. The WindFreak
+        firmware parses concatenated commands without separators.
+        """
+        self._send(b"".join(cmds))
+
+    def _set_async_writes(self, enabled: bool) -> None:
+        if enabled and self._tx_queue is None:
+            self._tx_queue = queue.Queue()
+            self._tx_thread = threading.Thread(
+                target=self._tx_worker, args=(self._tx_queue,), daemon=True
+            )
+            self._tx_thread.start()
+        elif not enabled and self._tx_queue is not None:
+            tx_queue, self._tx_queue = self._tx_queue, None
+            tx_queue.put(None)
+            tx_queue.join()
+            if self._tx_thread is not None:
+                self._tx_thread.join()
+                self._tx_thread = None
+
+    def _tx_worker(self, tx_queue: queue.Queue[Optional[bytes]]) -> None:
+        while True:
+            data = tx_queue.get()
+            try:
+                if data is None:
+                    return
+                self.instance.write(data)
+            except Exception:
+                logger.exception("%s[failed]", _pad(f"{self._NAME} async write"))
+            finally:
+                tx_queue.task_done()
+
+    def flush(self) -> None:
+        """
+        Blocks until all writes queued in async_writes mode are sent.
+        Returns immediately otherwise.
+        """
+        if self._tx_queue is not None:
+            self._tx_queue.join()
+
+    @contextmanager
+    def batched(self) -> Iterator[None]:
+        """
+        Context manager collecting all commands and sending them in a
+        single serial write on exit, in the order they were issued.
+
+        Example:
+            >>> with source.batched():
+            ...     source.set_frequency(2.87e9)
+            ...     source.set_amplitude(10)
+        """
+        if self._pending is not None:
+            # Nested use, the outermost block sends.
+            yield
+            return
+        self._pending = []
+        try:
+            yield
+        finally:
+            pending, self._pending = self._pending, None
+        if pending:
+            self.write_batch(pending)
+
+    def set_values(self) -> None:
+        """
+        Applies the configuration with a single serial write.
+        """
+        with self.batched():
+            super().set_values()
+        self.flush()
+
+    def query(self, cmd: bytes) -> str:
+        """
+        Sends a command and returns the response of the device without
+        the line termination. Reading stops at the first newline instead
+        of waiting for the port timeout. Bytes that are already waiting
+        after the newline are read in the same pass.
+        Stale bytes left over from earlier responses are discarded first,
+        so they are not mistaken for the answer.
+        """
+        self.flush()
+        if self.instance.in_waiting:
+            self.instance.reset_input_buffer()
+        self.instance.write(cmd)
+        line = self.instance.read_until(b"\n")
+        if self.instance.in_waiting:
+            line += self.instance.read(self.instance.in_waiting)
+        return line.decode().rstrip("\r\n")
+
+    def get_firmware_version(self) -> str:
+        return self.query(self._CMD_VER)
+
+    def get_model_type(self) -> str:
+        return self.query(self._CMD_MODEL)
+
+    def _command(self, template: bytes, channel: str, value: Any) -> bytes:
+        if self._SELECT_CHANNEL:
+            return template % (_as_int("the WindFreak channel", channel), value)
+        return template % value
 
-    @validate_call
     @coerce_device_config_shape
     @loop_inputs
-    def set_amplitude(self, ampl: ParameterInput) -> None:
-        _channel, ampl = ampl
-        self.instance.write(f"a{ampl}".encode())  # min 0 , max 63
-        logging.info("Windfreak set amplitude to".ljust(65, ".") + f"{ampl}")
+    def set_amplitude(self, ampl: ParameterInput, force: bool = False) -> None:
+        channel, ampl = cast(_ChannelValue, ampl)
+        ampl = _as_float("the WindFreak amplitude", ampl)
+        if not force and self._last_ampl.get(channel) == ampl:
+            return
+        self._write(self._command(self._CMD_AMPL, channel, ampl))
+        self._last_ampl[channel] = ampl
+        logger.info("%s%s", _pad("Windfreak set amplitude to"), ampl)
 
-    @validate_call
     @coerce_device_config_shape
     @loop_inputs
-    def set_frequency(self, freq: ParameterInput) -> None:
-        _channel, freq = freq
-        freq = freq / 1.0e6  # convert to MHz
-        self.instance.write(f"f{round(freq, 1)}".encode())
-        logging.info("Windfreak set frequency to [MHz]".ljust(65, ".") + f"{freq}")
+    def set_frequency(self, freq: ParameterInput, force: bool = False) -> None:
+        channel, freq = cast(_ChannelValue, freq)
+        freq = _as_float("the WindFreak frequency", freq)
+        mhz = round(freq / 1.0e6, self._FREQ_DECIMALS)
+        if not force and self._last_mhz.get(channel) == mhz:
+            return
+        self._write(self._command(self._CMD_FREQ, channel, mhz))  # MHz
+        self._last_mhz[channel] = mhz
+        logger.info("%s%s", _pad("Windfreak set frequency to [MHz]"), freq / 1.0e6)
+
+    def set_frequency_array(
+        self, freqs: Sequence[float], channel: int = 1
+    ) -> Iterator[float]:
+        """
+        Steps through an array of frequencies in Hz. The conversion to
+        rounded MHz and the command bytes for all points are prepared in
+        one go up front. Each step writes one point (unless the rounded
+        value is already set) and then yields its frequency, so the
+        caller measures inside the loop.
+
+        Example:
+            >>> for freq in source.set_frequency_array(np.linspace(2.8e9, 2.9e9, 101)):
+            ...     data.append(sensor.acquire_data().copy())
+        """
+        key = str(channel)
+        freq_array = np.asarray(freqs, dtype=np.float64)
+        mhzs = np.round(freq_array * 1.0e-6, self._FREQ_DECIMALS).tolist()
+        cmds = [self._command(self._CMD_FREQ, key, mhz) for mhz in mhzs]
+        for freq, mhz, cmd in zip(freq_array.tolist(), mhzs, cmds):
+            if self._last_mhz.get(key) != mhz:
+                self._write(cmd)
+                self._last_mhz[key] = mhz
+            yield freq
+
+    def sweep(self, freqs: Sequence[float], channel: int = 1) -> Iterator[float]:
+        """
+        See :meth:`SignalSource.sweep`, using :meth:`set_frequency_array`.
+        """
+        return self.set_frequency_array(freqs, channel)
 
     @validate_call
     @coerce_device_config_shape
     @loop_inputs
     def _set_power_level(self, power_level: ParameterInput) -> None:
-        # High - 1, Low - 0
+        # High - 1, Low - 0; on the SynthHD Mini the output only follows
+        # the set dBm in high power mode.
         _channel, power_level = power_level
-        self.instance.write(f"h{power_level}".encode())
-        logging.info("Windfreak power level set to".ljust(65, ".") + f"{power_level}")
+        power_level = _as_int("the WindFreak power level", power_level)
+        if power_level == self._power_level:
+            return
+        self._write(self._CMD_POWER % power_level)
+        self._power_level = power_level
+        logger.info("%s%s", _pad("Windfreak power level set to"), power_level)
 
     @validate_call
     @coerce_device_config_shape
     @loop_inputs
     def _set_output_on_off(self, on_off: ParameterInput) -> None:
         _channel, on_off = on_off
-        self.instance.write(f"o{on_off}".encode())
+        on_off = _as_int("the WindFreak output", on_off)
+        if on_off == self._output_on:
+            return
+        self._write(self._CMD_OUTPUT % on_off)
+        self._output_on = on_off
         logparam = "[ON]" if on_off == 1 else "[OFF]"
-        logging.info("WindFreak output set".ljust(65, ".") + logparam)
+        logger.info("%s%s", _pad("WindFreak output set"), logparam)
+
+    def clear_cache(self) -> None:
+        super().clear_cache()
+        self._power_level = None
+        self._output_on = None
 
     def close(self) -> None:
+        self._set_async_writes(False)
         self.instance.close()
-        logging.info("WindFreak instance closed".ljust(65, ".") + "[done]")
+        logger.info("%s[done]", _pad(f"{self._NAME} instance closed"))
 
 
-class WindFreakHDM(SignalSource):
-    def __init__(self, address: str, configuration: Dict[str, Any]) -> None:
-        self.address = address
-        super().__init__(configuration)
-        self.instance = serial.Serial(self.address, timeout=1)
-        self._set_power_level(1)
-        self.attribute_map["power_level"] = self._set_power_level
-        self.attribute_map["output_on_off"] = self._set_output_on_off
+class WindFreakSNV(WindFreakSerial):
+    """WindFreak SynthNV, amplitude in steps from 0 to 63."""
 
     def __repr__(self) -> str:
-        return f"WindFreakHDM(address: {self.address})"
+        return f"WindFreak(address: {self.address})"
 
     def __str__(self) -> str:
-        return f"Signal source of type (synth-hd) WindFreakHDM(address: {self.address})"
+        return f"Signal source of type (synth-nv) WindFreak(address: {self.address})"
 
-    @validate_call
-    @coerce_device_config_shape
-    @loop_inputs
-    def set_amplitude(self, ampl: ParameterInput) -> None:
-        channel, ampl = ampl
-        self.instance.write(f"C{channel}".encode())
-        self.instance.write(f"W{ampl}".encode())  # min 0 , max 63
-        logging.info("Windfreak set amplitude to".ljust(65, ".") + f"{ampl}")
 
-    @validate_call
-    @coerce_device_config_shape
-    @loop_inputs
-    def set_frequency(self, freq: ParameterInput) -> None:
-        channel, freq = freq
-        self.instance.write(f"C{channel}".encode())
-        freq = freq / 1.0e6  # convert to MHz
-        self.instance.write(f"f{round(freq, 8)}".encode())
-        logging.info("Windfreak set frequency to [MHz]".ljust(65, ".") + f"{freq}")
+class WindFreakHDM(WindFreakSerial):
+    """WindFreak SynthHD, two channels selected per command."""
 
-    @validate_call
-    @coerce_device_config_shape
-    @loop_inputs
-    def _set_power_level(self, power_level: ParameterInput) -> None:
-        # High - 1, Low - 0
-        _channel, power_level = power_level
-        self.instance.write(f"h{power_level}".encode())
-        logging.info("Windfreak power level set to".ljust(65, ".") + f"{power_level}")
+    _CMD_AMPL = b"C%dW%.3f"
+    _CMD_FREQ = b"C%df%.8f"
+    _FREQ_DECIMALS = 8
+    _SELECT_CHANNEL = True
 
-    @validate_call
-    @coerce_device_config_shape
-    @loop_inputs
-    def _set_output_on_off(self, on_off: ParameterInput) -> None:
-        _channel, on_off = on_off
-        self.instance.write(f"o{on_off}".encode())
-        logparam = "[ON]" if on_off == 1 else "[OFF]"
-        logging.info("WindFreak output set".ljust(65, ".") + logparam)
+    def __repr__(self) -> str:
+        return f"WindFreakHDM(address: {self.address})"
 
-    def close(self) -> None:
-        self.instance.close()
-        logging.info("WindFreak instance closed".ljust(65, ".") + "[done]")
+    def __str__(self) -> str:
+        return f"Signal source of type (synth-hd) WindFreakHDM(address: {self.address})"
 
 
 class WindFreakOfficial(SignalSource):
     def __init__(self, address: str, configuration: Dict[str, Any]) -> None:
         self.address = address
         super().__init__(configuration)
+        from windfreak import SynthHD
+
         self.instance = SynthHD(self.address)
         self.instance.init()
         # self._set_power_level(1)
@@ -486,31 +894,34 @@ class WindFreakOfficial(SignalSource):
             f"Signal source of type (synth-mini) WindFreakMini(address: {self.address})"
         )
 
-    @validate_call
     @coerce_device_config_shape
     @loop_inputs
-    def set_amplitude(self, ampl: ParameterInput) -> None:
-        channel, ampl = ampl
-        channel = int(channel)
+    def set_amplitude(self, ampl: ParameterInput, force: bool = False) -> None:
+        channel, ampl = cast(_ChannelValue, ampl)
         ampl = float(ampl)
-        self.instance[channel].power = ampl
-        logging.info(
-            f"Windfreak set amplitude channel{channel} to".ljust(65, ".") + f"{ampl}"
-        )
+        if not force and self._last_ampl.get(channel) == ampl:
+            return
+        self._last_ampl[channel] = ampl
+        self.instance[int(channel)].power = ampl
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "%s%s", _pad(f"Windfreak set amplitude channel{channel} to"), ampl
+            )
 
-    @validate_call
     @coerce_device_config_shape
     @loop_inputs
-    def set_frequency(self, freq: ParameterInput) -> None:
-        channel, freq = freq
-        channel = int(channel)
+    def set_frequency(self, freq: ParameterInput, force: bool = False) -> None:
+        channel, freq = cast(_ChannelValue, freq)
         freq = float(freq)
+        if not force and self._last_freq.get(channel) == freq:
+            return
+        self._last_freq[channel] = freq
         # might need rouding
-        self.instance[channel].frequency = freq
-        logging.info(
-            f"Windfreak set channel {channel} frequency to [Hz]".ljust(65, ".")
-            + f"{freq}"
-        )
+        self.instance[int(channel)].frequency = freq
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "%s%s", _pad(f"Windfreak set channel {channel} frequency to [Hz]"), freq
+            )
 
     # def _set_power_level(self, power_level: ParameterInput) -> None:
     #     # High - 1, Low - 0
@@ -528,66 +939,24 @@ class WindFreakOfficial(SignalSource):
         on_off = True if on_off == 1 else False
         self.instance[channel].enable = on_off
         logparam = "[ON]" if on_off == 1 else "[OFF]"
-        logging.info("WindFreak output set".ljust(65, ".") + logparam)
+        logger.info("%s%s", _pad("WindFreak output set"), logparam)
 
     def close(self) -> None:
         self.instance.close()
-        logging.info("WindFreak instance closed".ljust(65, ".") + "[done]")
+        logger.info("%s[done]", _pad("WindFreak instance closed"))
 
 
-class WindFreakSHDMini(SignalSource):
-
-    def __init__(self, address: str, configuration: Dict[str, Any]) -> None:
-        self.address = address
-        super().__init__(configuration)
-        self.instance = serial.Serial(self.address, timeout=1)
-        self._set_power_level(1)
-        self.attribute_map["power_level"] = self._set_power_level
-        self.attribute_map["output_on_off"] = self._set_output_on_off
-
-    @validate_call
-    @coerce_device_config_shape
-    @loop_inputs
-    def set_amplitude(self, ampl: ParameterInput) -> None:
-        channel, ampl = ampl
-        self.instance.write(f"W{ampl}".encode()) # min -13.000, max 20.000
-        logging.info("Windfreak set amplitude to".ljust(65, ".") + f"{ampl}")
-
-    @validate_call
-    @coerce_device_config_shape
-    @loop_inputs
-    def set_frequency(self, freq: ParameterInput) -> None:
-        channel, freq = freq
-        freq = freq / 1.0e6  # convert to MHz
-        self.instance.write(f"f{round(freq, 8)}".encode())
-        logging.info("Windfreak set frequency to [MHz]".ljust(65, ".") + f"{freq}")
-
-
-    @validate_call
-    @coerce_device_config_shape
-    @loop_inputs
-    def _set_power_level(self, power_level: ParameterInput) -> None:
-        _channel, power_level = power_level
-        # High - 1, Low - 0;  only in high power mode the output actually changes with the assigned dBm
-        self.instance.write(f"h{power_level}".encode())
-        logging.info("Windfreak power level set to".ljust(65, ".") + f"{power_level}")
-
-    @validate_call
-    @coerce_device_config_shape
-    @loop_inputs
-    def _set_output_on_off(self, on_off: ParameterInput) -> None:
-        _channel, on_off = on_off
-        self.instance.write(f"E{on_off}".encode())
-        logparam = "[ON]" if on_off == 1 else "[OFF]"
-        logging.info("WindFreak output set".ljust(65, ".") + logparam)
+class WindFreakSHDMini(WindFreakSerial):
+    """WindFreak SynthHD Mini, amplitude in dBm from -13 to 20."""
 
+    _NAME = "WindFreak SynthHD Mini"
+    _CMD_AMPL = b"W%.3f"  # dBm from -13.000 to 20.000
+    _CMD_FREQ = b"f%.8f"
+    _CMD_OUTPUT = b"E%d"
+    _FREQ_DECIMALS = 8
 
     def __repr__(self) -> str:
         return f"WindFreak SynthHD Mini (address: {self.address})"
 
     def __str__(self) -> str:
         return f"Signal source of type WindFreak SynthHD Mini (address: {self.address})"
-
-    def close(self) -> None:
-        self.instance.close()
-        logging.info("WindFreak SynthHD Mini instance closed".ljust(65, ".") + "[done]")
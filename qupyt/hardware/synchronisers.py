@@ -1,47 +1,114 @@
 # pylint: disable=logging-format-interpolation
 # pylint: disable=logging-not-lazy
+# pylint: disable=import-outside-toplevel
 """
 Handle AWG input and output.
 """
 
 from __future__ import annotations
+import hashlib
 import logging
 import pickle
-from time import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from time import sleep, time
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Tuple, List, Union
+from functools import lru_cache
+from itertools import repeat
+from typing import Any, Dict, Optional, Tuple, List, Union
 from pathlib import Path
 import sys
-import ctypes as ct
 
-import yaml
-import matplotlib.pyplot as plt
 import numpy as np
-from tqdm import tqdm
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
 from termcolor import colored
 
 from qupyt.set_up import get_seq_dir
 from qupyt.pulse_sequences.SequenceDesigner import (
     PulseSequenceYaml,
     PulseBlasterSequence,
+    load_yaml_sequence,
 )
-from pulsestreamer import PulseStreamer
-from pulsestreamer import findPulseStreamers
-from pulsestreamer import TriggerStart, TriggerRearm
-from pulsestreamer import Sequence, OutputState
 from qupyt.hardware.visa_handler import VisaObject
 from qupyt import set_up
 from qupyt.mixins import ConfigurationMixin, UpdateConfigurationType, PulseSequenceError
 
 try:
     import qupyt.hardware.wrappers.spinapi_adapted as spapi
-except (ImportError, NameError):
+except ImportError:
     spapi = None
     logging.warning(
         "Could not load spinapi library".ljust(65, ".")
         + "[failed]\nIf you are not using a Pulse Streamer you do not need this!"
     )
 
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=512)
+def _pad(label: str) -> str:
+    """Log label padded with dots to the usual status column."""
+    return label.ljust(65, ".")
+
+
+# SCPI templates of the Tektronix AWG waveform upload.
+_CMD_WAVE_DELETE = 'wlist:waveform:delete "{}"'.format
+_CMD_WAVE_NEW = 'wlist:waveform:new "{}",{},real'.format
+_CMD_WAVE_DATA = b'wlist:waveform:data "%s",'
+_CMD_WAVE_MARKER = b'wlist:waveform:marker:data "%s",'
+
+
+def _build_seq_numpy(
+    starts: np.ndarray, durations: np.ndarray, total: int, ignore_total: bool
+) -> np.ndarray:
+    """
+    Returns the (duration, level) pairs of a digital PulseStreamer
+    channel: a low before and a high for every pulse, followed by a
+    final low up to total unless ignore_total is set.
+    """
+    n_pulses = len(starts)
+    seq = np.empty((2 * n_pulses + (not ignore_total), 2), dtype=np.int64)
+    ends = starts + durations
+    seq[0 : 2 * n_pulses : 2, 0] = starts
+    seq[2 : 2 * n_pulses : 2, 0] -= ends[:-1]
+    seq[0 : 2 * n_pulses : 2, 1] = 0
+    seq[1 : 2 * n_pulses : 2, 0] = durations
+    seq[1 : 2 * n_pulses : 2, 1] = 1
+    if not ignore_total:
+        seq[-1, 0] = total - (ends[-1] if n_pulses else 0)
+        seq[-1, 1] = 0
+    return seq
+
+
+if njit is not None:
+
+    @njit(cache=True)
+    def _build_seq(
+        starts: np.ndarray, durations: np.ndarray, total: int, ignore_total: bool
+    ) -> np.ndarray:
+        n_pulses = len(starts)
+        seq = np.empty((2 * n_pulses + (0 if ignore_total else 1), 2), dtype=np.int64)
+        pointer = 0
+        for i in range(n_pulses):
+            seq[2 * i, 0] = starts[i] - pointer
+            seq[2 * i, 1] = 0
+            seq[2 * i + 1, 0] = durations[i]
+            seq[2 * i + 1, 1] = 1
+            pointer = starts[i] + durations[i]
+        if not ignore_total:
+            seq[-1, 0] = total - pointer
+            seq[-1, 1] = 0
+        return seq
+
+else:
+    _build_seq = _build_seq_numpy
+
 
 class SynchroniserFactory:
     """
@@ -191,8 +258,13 @@ class AWGenerator(VisaObject, Synchroniser):
         self.flag_channels = self._extract_flags(channel_mapping)
 
         self.wavenames: list[str]
+        self._wave_index: Dict[str, int] = {}
         self.seqrepeats: list[int]
-        self.waveform_block: np.ndarray
+        # Analog samples (float32) and marker bytes (uint8) of every
+        # waveform, indexed as [waveform, channel, sample]. Only held
+        # while uploading, see _release_waveform_blocks.
+        self._analog_block: Optional[np.ndarray] = None
+        self._marker_block: Optional[np.ndarray] = None
         self.analog_amplitude: float = 1.0
         self.marker_amplitude: float = 1.75
         self.dac_resolution: int = 12
@@ -207,6 +279,15 @@ class AWGenerator(VisaObject, Synchroniser):
             self._update_from_configuration(configuration)
         VisaObject.__init__(self, self.address, self.device_type)
         self.instance.timeout = 20000
+        # The VISA session is shared with the upload worker thread.
+        self._visa_lock = threading.Lock()
+        # Waveforms are sent by a single background worker, so preparing
+        # the next waveform overlaps with sending the previous one. It is
+        # started on the first upload and shut down by close().
+        self._upload_pool: Optional[ThreadPoolExecutor] = None
+        # Maps "<wavename>_<channel>" to the name of the uploaded waveform
+        # with identical content, see _upload_waveforms.
+        self._wave_alias: Dict[str, str] = {}
 
     def _extract_flags(self, channel_mapping: Dict[str, Union[int, str]]) -> list[str]:
         return [
@@ -219,23 +300,24 @@ class AWGenerator(VisaObject, Synchroniser):
         self._configure()
 
     def close(self) -> None:
-        """Passing"""
+        if self._upload_pool is not None:
+            self._upload_pool.shutdown(wait=True)
+            self._upload_pool = None
+        self._release_waveform_blocks()
 
     def run(self) -> None:
         self.instance.write("awgcontrol:run:immediate")
-        logging.info("Turned on AWG output to RUN immediate".ljust(
-            65, ".") + "[done]")
+        logger.info("%s[done]", _pad("Turned on AWG output to RUN immediate"))
         self.opc_wait()
 
     def stop(self) -> None:
         self.instance.write("awgcontrol:stop:immediate")
-        logging.info("Turned on AWG output to STOP immediate".ljust(
-            65, ".") + "[done]")
+        logger.info("%s[done]", _pad("Turned on AWG output to STOP immediate"))
         self.opc_wait()
 
     def trigger(self) -> None:
         self.instance.write("trigger:immediate atrigger")
-        logging.info("Sent trigger to AWG".ljust(65, ".") + "[done]")
+        logger.info("%s[done]", _pad("Sent trigger to AWG"))
 
     def load_sequence(self) -> None:
         self.stop()
@@ -245,13 +327,12 @@ class AWGenerator(VisaObject, Synchroniser):
         )
         sequence_translator.translate_yaml_to_numeric_instructions()
         self._load_sequence_block(get_seq_dir() / "sequence.npz")
-        self._upload_waveforms()
+        try:
+            self._upload_waveforms()
+        finally:
+            self._release_waveform_blocks()
         self._sequence("autoseq", nongatereps=1)
-        logging.info(
-            "Loaded and sequenced current pulse sequence".ljust(
-                65, ".") + "[done]"
-        )
-        self.opc_wait()
+        logger.info("%s[done]", _pad("Loaded and sequenced current pulse sequence"))
 
     def _configure(self) -> None:
         self._set_sampling_rate()
@@ -262,145 +343,217 @@ class AWGenerator(VisaObject, Synchroniser):
             for marker in self.marker_channels:
                 self._set_marker_amplitude(
                     channel, marker, self.marker_amplitude)
+        # The setters only write, the device works through the commands
+        # in order and is waited for once.
+        self.opc_wait()
         print("Configuring AWG".ljust(65, ".") + colored(" [done]", "green"))
 
-    def _upload_waveform(self, wavename: str, waveform: np.ndarray) -> None:
-        self.instance.write('wlist:waveform:delete "' + wavename + '"')
-        self.instance.write(
-            'wlist:waveform:new "' + wavename +
-            '",' + str(waveform.shape[1]) + ",real"
-        )
-        self.instance.write_binary_values(
-            'wlist:waveform:data "' + wavename + '",', waveform[0, :]
-        )
-        self.instance.write_binary_values(
-            'wlist:waveform:marker:data "' + wavename + '",',
-            waveform.astype(np.uint8)[1, :],
-            datatype="B",
+    def _upload_waveform(
+        self, wavename: str, analog: np.ndarray, markers: np.ndarray
+    ) -> None:
+        name = wavename.encode()
+        with self._visa_lock:
+            self.instance.write(_CMD_WAVE_DELETE(wavename))
+            self.instance.write(_CMD_WAVE_NEW(wavename, len(analog)))
+            self._write_block(_CMD_WAVE_DATA % name, analog.astype("<f4", copy=False))
+            self._write_block(
+                _CMD_WAVE_MARKER % name, markers.astype(np.uint8, copy=False)
+            )
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("%s[done]", _pad(f"Uploaded waveform {wavename}"))
+
+    def _write_block(self, command: bytes, data: np.ndarray) -> None:
+        """
+        Sends command followed by the raw bytes of data as an IEEE 488.2
+        definite length block, the same message write_binary_values
+        builds, without packing the samples one by one.
+        """
+        length = str(data.nbytes).encode()
+        termination = (self.instance.write_termination or "").encode()
+        # data.data is a memoryview of the samples, copied once into payload.
+        payload: bytes = b"".join(
+            (command, b"#%d" % len(length), length, data.data.cast("B"), termination)
         )
-        logging.info(f"Uploaded waveform {wavename}".ljust(65, ".") + "[done]")
-        self.opc_wait()
+        self.instance.write_raw(payload)
+
+    def _wave_name(self, wavename: str, channel: int) -> str:
+        """
+        Name under which the waveform of wavename on channel was uploaded.
+        """
+        name = f"{wavename}_{channel}"
+        return self._wave_alias.get(name, name)
 
     def _sequence(self, seqname: str, nongatereps: int = 1) -> None:
         print("Setting up sequencer".ljust(65, "."), end="")
-        for channel in self.channels:
-            self.instance.write(f'slist:sequence:delete "sub_{channel}"')
-            self.instance.write(
-                f'slist:sequence:new "sub_{channel}",{len(self.wavenames)},1'
-            )
-            self.instance.write(
-                f'slist:sequence:event:jtiming "sub_{channel}" immediate'
-            )
-            for i, wavename in enumerate(self.wavenames):
-                self.instance.write(
-                    f'slist:sequence:step{i+1}:rcount "sub_{channel}",{self.seqrepeats[i]}'
+        # All commands are sent as compound commands in a few writes,
+        # with a single OPC wait once the batch is flushed.
+        with self.batched():
+            for channel in self.channels:
+                self.write_cmd(f'slist:sequence:delete "sub_{channel}"')
+                self.write_cmd(
+                    f'slist:sequence:new "sub_{channel}",{len(self.wavenames)},1'
                 )
-                self.instance.write(
-                    f'slist:sequence:step{i+1}:tasset1:waveform "sub_{channel}","{wavename}_{channel}"'
+                self.write_cmd(
+                    f'slist:sequence:event:jtiming "sub_{channel}" immediate'
                 )
+                for i, wavename in enumerate(self.wavenames):
+                    self.write_cmd(
+                        f'slist:sequence:step{i+1}:rcount "sub_{channel}",{self.seqrepeats[i]}'
+                    )
+                    self.write_cmd(
+                        f'slist:sequence:step{i+1}:tasset1:waveform "sub_{channel}","{self._wave_name(wavename, channel)}"'
+                    )
 
-                for flag_channel in self.flag_channels:
-                    if flag_channel in self.flag_values[wavename]:
-                        self.instance.write(
-                            f'slist:sequence:step{i+1}:tflag1:{flag_channel}flag "sub_{channel}",HIGH'
-                        )
-                    else:
-                        self.instance.write(
-                            f'slist:sequence:step{i+1}:tflag1:{flag_channel}flag "sub_{channel}",LOW'
-                        )
-
-            self.instance.write(f'slist:sequence:delete "{seqname}_{channel}"')
-            self.instance.write(
-                f'slist:sequence:new "{seqname}_{channel}",2,1')
-            self.instance.write(
-                f'slist:sequence:step2:goto "{seqname}_{channel}",first'
-            )
-            self.instance.write(
-                f'slist:sequence:event:jtiming "{seqname}_{channel}" immediate'
-            )
+                    for flag_channel in self.flag_channels:
+                        if flag_channel in self.flag_values[wavename]:
+                            self.write_cmd(
+                                f'slist:sequence:step{i+1}:tflag1:{flag_channel}flag "sub_{channel}",HIGH'
+                            )
+                        else:
+                            self.write_cmd(
+                                f'slist:sequence:step{i+1}:tflag1:{flag_channel}flag "sub_{channel}",LOW'
+                            )
+
+                self.write_cmd(f'slist:sequence:delete "{seqname}_{channel}"')
+                self.write_cmd(f'slist:sequence:new "{seqname}_{channel}",2,1')
+                self.write_cmd(f'slist:sequence:step2:goto "{seqname}_{channel}",first')
+                self.write_cmd(
+                    f'slist:sequence:event:jtiming "{seqname}_{channel}" immediate'
+                )
 
-            # for gating pulse
-            self.instance.write(
-                f'slist:sequence:step1:goto "{seqname}_{channel}", first'
-            )
-            self.instance.write(
-                f'slist:sequence:step1:ejinput "{seqname}_{channel}", ATR'
-            )
-            self.instance.write(
-                f'slist:sequence:step1:ejump "{seqname}_{channel}", 2'
-            )
-            self.instance.write(
-                f'slist:sequence:step1:tasset1:waveform "{seqname}_{channel}","{self.wavenames[0]}_{channel}"'
-            )
+                # for gating pulse
+                self.write_cmd(
+                    f'slist:sequence:step1:goto "{seqname}_{channel}", first'
+                )
+                self.write_cmd(
+                    f'slist:sequence:step1:ejinput "{seqname}_{channel}", ATR'
+                )
+                self.write_cmd(f'slist:sequence:step1:ejump "{seqname}_{channel}", 2')
+                self.write_cmd(
+                    f'slist:sequence:step1:tasset1:waveform "{seqname}_{channel}","{self._wave_name(self.wavenames[0], channel)}"'
+                )
 
-            # for actual seq
-            self.instance.write(
-                f'slist:sequence:step2:rcount "{seqname}_{channel}", {nongatereps}'
-            )
-            self.instance.write(
-                f'slist:sequence:step2:tasset1:sequence "{seqname}_{channel}","sub_{channel}"'
-            )
+                # for actual seq
+                self.write_cmd(
+                    f'slist:sequence:step2:rcount "{seqname}_{channel}", {nongatereps}'
+                )
+                self.write_cmd(
+                    f'slist:sequence:step2:tasset1:sequence "{seqname}_{channel}","sub_{channel}"'
+                )
 
-            self.instance.write(
-                f'source{channel}:casset:sequence "{seqname}_{channel}",1'
-            )
-        self.opc_wait()
+                self.write_cmd(
+                    f'source{channel}:casset:sequence "{seqname}_{channel}",1'
+                )
         print(colored(" [done]", "green"))
 
     def _load_sequence_block(self, seqname: Path) -> None:
         block = np.load(seqname)
-        self.waveform_block = block["arr_0"]
+        waveform_files = block["arr_0"]
+        if waveform_files.ndim == 1:
+            # Names of the .npy files holding the float32 analog samples
+            # and the uint8 marker bytes, both indexed as
+            # [waveform, channel, sample].
+            self._analog_block = np.load(
+                seqname.parent / str(waveform_files[0]), mmap_mode="r"
+            )
+            self._marker_block = np.load(
+                seqname.parent / str(waveform_files[1]), mmap_mode="r"
+            )
+        else:
+            # Archives written by older versions hold a single float64
+            # block with analog and marker rows interleaved per channel.
+            self._analog_block = np.ascontiguousarray(
+                waveform_files[:, 0::2], dtype=np.float32
+            )
+            self._marker_block = np.ascontiguousarray(
+                waveform_files[:, 1::2], dtype=np.uint8
+            )
         self.seqrepeats = list(block["arr_1"])
         self.wavenames = list(block["arr_2"])
+        # Rows of the waveform block, one per distinct block name in
+        # sorted order, as written by PulseSequenceYaml.
+        self._wave_index = {
+            wavename: i for i, wavename in enumerate(sorted(set(self.wavenames)))
+        }
         self.flag_values = pickle.loads(block["arr_5"])
-        logging.info("loaded wave sequence from file".ljust(
-            65, ".") + f"{seqname}")
+        logger.info("%s%s", _pad("loaded wave sequence from file"), seqname)
 
     def _clear_awg(self) -> None:
         self.instance.write("slist:sequence:delete all")
         self.instance.write("wlist:waveform:delete all")
-        logging.info("Clear all AWG slist and wlist".ljust(65, ".") + "[done]")
+        logger.info("%s[done]", _pad("Clear all AWG slist and wlist"))
         self.opc_wait()
 
+    def _release_waveform_blocks(self) -> None:
+        """
+        Drops the waveform blocks. They may map the .npy files of the
+        sequence, which are rewritten by the next PulseSequence.make and
+        must not stay mapped: Windows refuses to overwrite a mapped file
+        and on Linux truncating it invalidates the mapping.
+        """
+        self._analog_block = None
+        self._marker_block = None
+
     def _upload_waveforms(self) -> None:
         time_1 = time()
-        sorted_wavenames = sorted(set(self.wavenames))
-        for i, wavename in tqdm(
-            enumerate(sorted_wavenames),
-            total=len(sorted_wavenames),
-            ascii=True,
-            desc="uploading waveforms",
-        ):
+        analog_block, marker_block = self._analog_block, self._marker_block
+        if analog_block is None or marker_block is None:
+            raise RuntimeError("No waveform block loaded to upload")
+        upload_pool = self._upload_pool
+        if upload_pool is None:
+            upload_pool = self._upload_pool = ThreadPoolExecutor(max_workers=1)
+        # Waveforms with identical samples and markers are uploaded once,
+        # later occurrences are referenced by the name of the first one.
+        self._wave_alias = {}
+        uploaded: Dict[bytes, str] = {}
+        uploads = []
+        for wavename, i in self._wave_index.items():
             for channel_index, channel in enumerate(self.channels):
-                self._upload_waveform(
-                    f"{wavename}_{channel}",
-                    self.waveform_block[i, channel_index *
-                                        2: (channel_index * 2) + 2],
-                )
-                self.opc_wait()
-        logging.info(
-            f"Uploaded Tektronix AWG waveforms in {time() - time_1} seconds".ljust(
-                65, "."
+                name = f"{wavename}_{channel}"
+                analog = analog_block[i, channel_index]
+                markers = marker_block[i, channel_index]
+                digest = hashlib.blake2b(analog, digest_size=16)
+                digest.update(markers)
+                self._wave_alias[name] = uploaded.setdefault(digest.digest(), name)
+                if self._wave_alias[name] == name:
+                    uploads.append(
+                        upload_pool.submit(self._upload_waveform, name, analog, markers)
+                    )
+        # The waveforms are uploaded without waiting for the device in
+        # between. A single OPC wait at the end makes sure all of them
+        # are in place before they are sequenced.
+        from tqdm import tqdm
+
+        for upload in tqdm(
+            uploads, total=len(uploads), ascii=True, desc="uploading waveforms"
+        ):
+            upload.result()
+        self.opc_wait()
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "%s[done]",
+                _pad(
+                    f"Uploaded {len(uploads)} Tektronix AWG waveforms in {time() - time_1} seconds"
+                ),
             )
-            + "[done]"
-        )
 
     def _set_output_on(self, channel: int) -> None:
         self.instance.write(f"outp{channel} on")
-        logging.info(f"Set channel{channel} output to on".ljust(
-            65, ".") + "[done]")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("%s[done]", _pad(f"Set channel{channel} output to on"))
 
     def _set_daq_resolution(self, channel: int, dac_resolution: int) -> None:
         self.instance.write(f"source{channel}:dac:resolution {dac_resolution}")
-        logging.info(
-            f"Set AWG channel{channel} resolution to bit".ljust(65, ".")
-            + "{dac_resolution}"
-        )
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "%s%s",
+                _pad(f"Set AWG channel{channel} resolution to bit"),
+                dac_resolution,
+            )
 
     def _set_sampling_rate(self) -> None:
         self.instance.write(f"source:frequency {self.samprate}")
-        logging.info("AWG sampling rate".ljust(65, ".") + f"{self.samprate}")
-        self.opc_wait()
+        logger.info("%s%s", _pad("AWG sampling rate"), self.samprate)
 
     def _set_marker_amplitude(
         self, channel: int, marker: int, voltage: float = 1.75
@@ -408,22 +561,20 @@ class AWGenerator(VisaObject, Synchroniser):
         self.instance.write(
             f"SOURCE{channel}:MARKER{marker}:VOLTAGE:LEVEL:IMMEDIATE:HIGH {voltage}"
         )
-        self.opc_wait()
-        logging.info(
-            f"Set AWG channel{channel} marker{marker} to / V".ljust(65, ".")
-            + f"{voltage}"
-        )
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "%s%s", _pad(f"Set AWG channel{channel} marker{marker} to / V"), voltage
+            )
 
     def _set_analog_amplitude(self, channel: int, amplitude: float = 1.0) -> None:
         # amplitude is given in fractions of the max amplitude.
         self.instance.write(
             f"source{channel}:voltage:level:immediate:amplitude {amplitude}"
         )
-        self.opc_wait()
-        logging.info(
-            f"Set AWG channel{channel} analog amplitude to".ljust(65, ".")
-            + f"{amplitude}"
-        )
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "%s%s", _pad(f"Set AWG channel{channel} analog amplitude to"), amplitude
+            )
 
     def _set_device_type(self, device_type: str) -> None:
         self.device_type = device_type
@@ -445,21 +596,21 @@ class AWGenerator(VisaObject, Synchroniser):
         :type wavename: str
         """
         marker = self.instance.query_binary_values(
-            'wlist:waveform:marker:data? "' + wavename + '"', datatype="B"
+            'wlist:waveform:marker:data? "' + wavename + '"',
+            datatype="B",
+            container=np.ndarray,
         )
         analog = self.instance.query_binary_values(
-            'wlist:waveform:data? "' + wavename + '"'
+            'wlist:waveform:data? "' + wavename + '"',
+            datatype="f",
+            container=np.ndarray,
         )
-        markers = np.zeros((4, len(marker)))
+        # Markers 1 to 4 are stored in bits 7 to 4 of every marker byte.
+        shifts = np.arange(7, 3, -1, dtype=np.uint8)[:, None]
+        markers = ((marker[None, :] >> shifts) & 1).astype(np.float64)
         print(np.shape(markers), np.shape(analog))
-        for i, mark in enumerate(marker):
-            num = bin(mark)[2:]
-            if not len(num) < 5:
-                for j in range(1, 5):
-                    try:
-                        markers[-j, i] = int(num[-(j + 4)])
-                    except Exception:
-                        break
+
+        import matplotlib.pyplot as plt
 
         plt.plot(np.asarray((analog)) * 0.5 + 4)
         plt.plot(markers[0, :] * 0.5 + 3)
@@ -469,6 +620,10 @@ class AWGenerator(VisaObject, Synchroniser):
         plt.show()
 
 
+# Parameters every PulseStreamer pulse has to define.
+_PULSE_PARAMETERS = ("start", "duration", "frequency", "amplitude", "phase")
+
+
 class PStreamer(Synchroniser):
     def __init__(
         self, configuration: Dict[str, Any], channel_mapping: Dict[str, Any]
@@ -487,6 +642,8 @@ class PStreamer(Synchroniser):
         return f"Synchronizer of type PStreamer(configuration: {self.initial_configuration_dict}, channel_mapping: {self.channel_mapping})"
 
     def _find_pulse_streamers(self) -> None:
+        from pulsestreamer import findPulseStreamers
+
         devices = findPulseStreamers()
         if devices:
             print("Detected PulseStreamer: ")
@@ -504,6 +661,8 @@ class PStreamer(Synchroniser):
         If an IP is not introduced -- search a device in the network.
         If an IP is introduced -- checks if correct and tries to connect.
         """
+        from pulsestreamer import PulseStreamer
+
         # if no IP adress is provided, try to detect one:
         try:
             self.pulser = PulseStreamer(self.address)
@@ -531,6 +690,8 @@ class PStreamer(Synchroniser):
         Function that stofull_pulse_list the playing sequence and sets all
         the channels to a ZERO state (0V).
         """
+        from pulsestreamer import OutputState
+
         try:
             # define the final state of the Pulsestreamer
             _ = OutputState.ZERO()
@@ -568,115 +729,107 @@ class PStreamer(Synchroniser):
 
         Recieves a dictionary of pulses and returns sequence for the
         PulseStreamer of the given channel: LASER, MW or READ.
+        The pulses are read from the arrays built by
+        :meth:`_pulse_arrays`.
         """
         self.channel_key = channel_key
-        self.seq = []  # sequence of the channel
-        pointer_i = 0  # pointer in time
         # Check if the asked channel_key exists in the file
-        if self.channel_key not in list(self.pulse_list.keys()):
+        if self.channel_key not in self.pulse_arrays:
             logging.error("KeyError: No element named " +
                           str(self.channel_key) + ".")
             raise KeyError
+        pulses = self.pulse_arrays[self.channel_key]
 
-        for i in range(len(self.pulse_list[self.channel_key])):
-            # Start and length of the pulse turned into
-            # float in case it has str format.
-            start_pulse_i = (
-                float(
-                    self.pulse_list.get(self.channel_key)
-                    .get("pulse" + str(i + 1))
-                    .get("start")
-                )
-                * 1e3
+        # Check for unsupported analog signals
+        if (pulses["frequency"] != 0).any():
+            logging.warning(
+                "Warning: Frequency different than 0. This programm does not support analog signals. Set frequency to 0."
             )
-            len_pulse_i = (
-                float(
-                    self.pulse_list.get(self.channel_key)
-                    .get("pulse" + str(i + 1))
-                    .get("duration")
-                )
-                * 1e3
+            raise PulseSequenceError
+        if (pulses["amplitude"] != 1).any():
+            logging.warning(
+                "Warning: Amplitude of the pulse different than 1 (can only be 0 or 1). This programm does not support analog signals. Set amplitude to 1."
             )
-            # Check if pulses are well defined
-            if pointer_i > start_pulse_i:
-                logging.error(
-                    "Error: "
-                    + self.channel_key
-                    + " sequence definition makes no sense, pulses are overlaping!"
-                )
-                raise PulseSequenceError
-
-            # Check for unsupported analog signals
-            freq_pulse_i = (
-                self.pulse_list.get(self.channel_key)
-                .get("pulse" + str(i + 1))
-                .get("frequency")
+            raise PulseSequenceError
+        if (pulses["phase"] != 0).any():
+            logging.warning(
+                "Warning: Phase of the pulse different than 0. This programm does not support analog signals. Set amplitude to 1."
             )
-            if freq_pulse_i != 0:
-                logging.warning(
-                    "Warning: Frequency different than 0. This programm does not support analog signals. Set frequency to 0."
-                )
-                raise PulseSequenceError
+            raise PulseSequenceError
 
-            ampl_pulse_i = (
-                self.pulse_list.get(self.channel_key)
-                .get("pulse" + str(i + 1))
-                .get("amplitude")
+        # Check for non-multples of the sampling time.
+        starts = np.rint(pulses["start"])
+        durations = np.rint(pulses["duration"])
+        if (starts != pulses["start"]).any() or (durations != pulses["duration"]).any():
+            logging.warning(
+                "Warning: Sampling unit is 1ns. Time values are being rounded."
             )
-            if ampl_pulse_i != 1 or ampl_pulse_i is None:
-                logging.warning(
-                    "Warning: Amplitude of the pulse different than 1 (can only be 0 or 1). This programm does not support analog signals. Set amplitude to 1."
-                )
-                raise PulseSequenceError
-
-            phase_pulse_i = (
-                self.pulse_list.get(self.channel_key)
-                .get("pulse" + str(i + 1))
-                .get("phase")
+        starts = starts.astype(np.int64)
+        durations = durations.astype(np.int64)
+
+        # Check if pulses are well defined, every pulse has to start
+        # after the previous one ended.
+        ends = starts + durations
+        previous_ends = np.concatenate(([0], ends[:-1]))
+        if (previous_ends > pulses["start"]).any():
+            logging.error(
+                "Error: "
+                + self.channel_key
+                + " sequence definition makes no sense, pulses are overlaping!"
             )
-            if phase_pulse_i != 0:
-                logging.warning(
-                    "Warning: Phase of the pulse different than 0. This programm does not support analog signals. Set amplitude to 1."
-                )
-                raise PulseSequenceError
-
-            # Check for non-multples of the sampling time.
-            if (start_pulse_i - round(start_pulse_i) != 0) or (
-                len_pulse_i - round(len_pulse_i) != 0
-            ):
-                logging.warning(
-                    "Warning: Sampling unit is 1ns. Time values are being rounded."
-                )
-                # Round the values and turn into integers
-                start_pulse_i = int(round(start_pulse_i))
-                len_pulse_i = int(round(len_pulse_i))
-                # Append a low and a high for each pulse: ___----
-                self.seq.append((start_pulse_i - pointer_i, 0))
-                self.seq.append((len_pulse_i, 1))
-                # Update pointer
-                pointer_i = start_pulse_i + len_pulse_i
-
-            else:
-                # Turn into integers
-                start_pulse_i = int(start_pulse_i)
-                len_pulse_i = int(len_pulse_i)
-                # Append a low and a high for each pulse: ___----
-                self.seq.append((start_pulse_i - pointer_i, 0))
-                self.seq.append((len_pulse_i, 1))
-                # Update pointer
-                pointer_i = start_pulse_i + len_pulse_i
+            raise PulseSequenceError
+        pointer = int(ends[-1]) if len(ends) else 0
 
         # Check if the sequence is longer than the defined total time.
-        if pointer_i > self.total_duration and self.total_duration_unparsed != "ignore":
+        ignore_total = self.total_duration_unparsed == "ignore"
+        if pointer > self.total_duration and not ignore_total:
             logging.error(
                 f"Error: {self.channel_key} duration exceeds the defined total time."
             )
             raise PulseSequenceError
-        # Add the final low to make the sequence last its length
-        if self.total_duration_unparsed != "ignore":
-            self.seq.append((self.total_duration - pointer_i, 0))
+        # A low and a high for each pulse: ___----, and the final low to
+        # make the sequence last its length.
+        self.seq = [
+            tuple(pulse)
+            for pulse in _build_seq(
+                starts,
+                durations,
+                0 if ignore_total else self.total_duration,
+                ignore_total,
+            ).tolist()
+        ]
         return self.seq
 
+    @staticmethod
+    def _pulse_arrays(pulse_list: Dict[str, Any]) -> Dict[str, Dict[str, np.ndarray]]:
+        """
+        Converts the pulses of every channel into one array per pulse
+        parameter, ordered pulse1, pulse2, ... Start and duration are
+        converted to ns.
+        """
+        arrays = {}
+        for channel, pulses in pulse_list.items():
+            names = ["pulse" + str(i + 1) for i in range(len(pulses))]
+            for name in names:
+                pulse = pulses.get(name)
+                if pulse is None:
+                    logging.error(f"Error: {channel} has no {name}.")
+                    raise PulseSequenceError
+                missing = [par for par in _PULSE_PARAMETERS if par not in pulse]
+                if missing:
+                    logging.error(
+                        f"Error: {name} of {channel} is missing {', '.join(missing)}."
+                    )
+                    raise PulseSequenceError
+            ordered = [pulses[name] for name in names]
+            arrays[channel] = {
+                par: np.array([float(pulse[par]) for pulse in ordered])
+                for par in _PULSE_PARAMETERS
+            }
+            arrays[channel]["start"] *= 1e3
+            arrays[channel]["duration"] *= 1e3
+        return arrays
+
     def plot_sequence(self) -> None:
         """
         From the given file plots the defined sequences
@@ -694,11 +847,12 @@ class PStreamer(Synchroniser):
         Calls the WriteDigSig() function and loads the corresponding sequences
         to the respective channels.
         """
+        from pulsestreamer import Sequence
+
         try:
             # Selected folder:
             self.yaml_file = set_up.get_seq_dir() / "sequence.yaml"
-            with open(self.yaml_file, "r", encoding="utf-8") as file:
-                full_pulse_list = yaml.load(file, Loader=yaml.FullLoader)
+            full_pulse_list = load_yaml_sequence(self.yaml_file)
             sequence_order = full_pulse_list["sequencing_order"]
             sequencing_repeats = full_pulse_list["sequencing_repeats"]
 
@@ -709,7 +863,8 @@ class PStreamer(Synchroniser):
             if total_duration_unparsed != "ignore":
                 total_duration = float(
                     total_duration_unparsed) * 1e3  # convert to ns
-                if total_duration - round(total_duration) != 0:
+                self.total_duration = int(np.rint(total_duration))
+                if self.total_duration != total_duration:
                     logging.warning(
                         "Warning: The total duration is not multiple of the\
                                 sampling time and is being rounded!".ljust(
@@ -717,41 +872,52 @@ class PStreamer(Synchroniser):
                         )
                         + "[WARNING]"
                     )
-                    self.total_duration = int(round(total_duration))
-                else:
-                    self.total_duration = int(total_duration)
 
             # Generate Sequence objects for all pulseseqeunce blocks.
             # These will be sequenced together later.
             sequences_to_write = {}
             for block in set(sequence_order):
                 sequences_to_write[block] = Sequence()
+                # The parsed file is shared, _pulse_arrays converts the
+                # values to float without modifying it.
                 self.pulse_list = full_pulse_list[block]
-                self.check_types(self.pulse_list)
+                self.pulse_arrays = self._pulse_arrays(self.pulse_list)
                 for channel in self.pulse_list:
                     sequences_to_write[block].setDigital(
                         self.channel_mapping[channel], self.writeDigSeq(
                             channel)
                     )
-            self.sequence = Sequence()
+            # Repeated blocks are built once. Sequence additions copy both
+            # operands, so the parts are joined pairwise, keeping the
+            # total work at O(n log n) instead of O(n^2). The values are
+            # pulsestreamer Sequence objects, the package ships no type
+            # information.
+            repeated_blocks: Dict[Tuple[str, int], Any] = {}
+            parts = []
             for block, repetitions in zip(sequence_order, sequencing_repeats):
-                self.sequence += repetitions * sequences_to_write[block]
+                if (block, repetitions) not in repeated_blocks:
+                    repeated_blocks[(block, repetitions)] = (
+                        repetitions * sequences_to_write[block]
+                    )
+                parts.append(repeated_blocks[(block, repetitions)])
+            while len(parts) > 1:
+                parts = [
+                    parts[i] + parts[i + 1] if i + 1 < len(parts) else parts[i]
+                    for i in range(0, len(parts), 2)
+                ]
+            self.sequence = parts[0] if parts else Sequence()
 
         except AttributeError:
             logging.exception("pulseseqeunce upload failed")
 
-    def check_types(self, pulse_list) -> None:
-        for channel in pulse_list:
-            for pulse, pulse_params in pulse_list[channel].items():
-                for par, par_value in pulse_params.items():
-                    pulse_list[channel][pulse][par] = float(par_value)
-
     def run(self) -> None:
         """
         Function that triggers the device:
         send trigger + play sequence one time.
         For now pass, write it later.
         """
+        from pulsestreamer import OutputState, TriggerStart, TriggerRearm
+
         try:
             # never runs the seq
             n_runs = 1
@@ -769,8 +935,12 @@ class PStreamer(Synchroniser):
 
             # upload the sequence and arm the device
             self.pulser.stream(self.sequence, n_runs, final)
+            # Poll with exponential backoff instead of spinning, which
+            # keeps a core and the connection to the device free.
+            delay = 0.001
             while self.pulser.isStreaming():
-                pass
+                sleep(delay)
+                delay = min(delay * 2, 0.05)
             # check if the sequence has been started correctly.
             logging.info("Pulse Strearmer: sent run signal".ljust(
                 65, ".") + "[done]")
@@ -795,6 +965,12 @@ class PStreamer(Synchroniser):
         )
 
 
+# Top level keys the MockGenerator expects in a sequence file.
+_REQUIRED_SEQUENCE_KEYS = frozenset(
+    ("total_duration", "sequencing_order", "sequencing_repeats")
+)
+
+
 class MockGenerator(Synchroniser):
     def __init__(self, configuration: Dict[str, Any], channel_mapping: Dict[str, Any]):
         self.channel_mapping = channel_mapping
@@ -804,8 +980,7 @@ class MockGenerator(Synchroniser):
         self.initial_configuration_dict = configuration
         if configuration is not None:
             self._update_from_configuration(configuration)
-        logging.info("MockSynchroniser instance created".ljust(
-            65, ".") + "[done]")
+        logger.info("%s[done]", _pad("MockSynchroniser instance created"))
 
     def __repr__(self) -> str:
         return f"MockGenerator(configuration: {self.initial_configuration_dict}, channel_mapping: {self.channel_mapping})"
@@ -814,30 +989,25 @@ class MockGenerator(Synchroniser):
         return f"Synchronizer of type MockGenerator(configuration: {self.initial_configuration_dict}, channel_mapping: {self.channel_mapping})"
 
     def open(self) -> None:
-        logging.info("Opened MockSynchroniser".ljust(65, ".") + "[done]")
+        logger.info("%s[done]", _pad("Opened MockSynchroniser"))
 
     def load_sequence(self) -> None:
         try:
             self.yaml_file = set_up.get_seq_dir() / "sequence.yaml"
-            with open(self.yaml_file, "r", encoding="utf-8") as file:
-                full_pulse_list = yaml.load(file, Loader=yaml.FullLoader)
-            total_duration = (
-                float(full_pulse_list["total_duration"]) * 1e3
-            )  # convert to ns
-            _ = full_pulse_list["sequencing_order"]
-            _ = full_pulse_list["sequencing_repeats"]
-            if total_duration - round(total_duration) != 0:
+            full_pulse_list = load_yaml_sequence(self.yaml_file)
+            # Exact decimal conversion to ns, 0.1 us must not be
+            # flagged as off grid because of binary floating point.
+            total_duration = Decimal(str(full_pulse_list["total_duration"])) * 1000
+            missing = _REQUIRED_SEQUENCE_KEYS - full_pulse_list.keys()
+            if missing:
+                raise KeyError(missing)
+            self.total_duration = int(total_duration.to_integral_value())
+            if self.total_duration != total_duration:
                 logging.warning(
                     "Warning: The total duration is not multiple of the sampling time and is being rounded!"
                 )
-                self.total_duration = int(round(total_duration))
-            else:
-                self.total_duration = int(total_duration)
 
-            logging.info(
-                "Loaded sequence for MockSynchroniser".ljust(
-                    65, ".") + "[done]"
-            )
+            logger.info("%s[done]", _pad("Loaded sequence for MockSynchroniser"))
 
         except AttributeError:
             logging.exception(
@@ -845,17 +1015,76 @@ class MockGenerator(Synchroniser):
             )
 
     def run(self) -> None:
-        logging.info("Sent run to MockSynchroniser".ljust(65, ".") + "[done]")
+        logger.info("%s[done]", _pad("Sent run to MockSynchroniser"))
 
     def trigger(self) -> None:
-        logging.info("Sent trigger from MockSynchroniser".ljust(
-            65, ".") + "[done]")
+        logger.info("%s[done]", _pad("Sent trigger from MockSynchroniser"))
 
     def stop(self) -> None:
-        logging.info("Stopped MockSynchroniser".ljust(65, ".") + "[done]")
+        logger.info("%s[done]", _pad("Stopped MockSynchroniser"))
 
     def close(self) -> None:
-        logging.info("Closed MockSynchroniser".ljust(65, ".") + "[done]")
+        logger.info("%s[done]", _pad("Closed MockSynchroniser"))
+
+
+# Lookup tables of the PulseBlaster short pulse feature, indexed by the
+# bin of the pulse length, see _classify_pulses.
+_SHORT_PULSE_EDGES = np.array([0.0, 0.003, 0.005, 0.007, 0.009])
+_SHORT_PULSE_BITS = np.array([0, 2**21, 2**22, 2**21 + 2**22, 2**23, 0], dtype=np.int64)
+_SHORT_PULSE_SNAP = np.array([np.nan, 0.002, 0.004, 0.006, 0.008, 0.01])
+
+
+def _classify_pulses_numpy(
+    durations: np.ndarray, masks: np.ndarray, min_instr_clk_cycles: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Applies the PulseBlaster short pulse feature to pulses shorter than
+    10 ns (durations in us). Their length is snapped to a whole number
+    of 2 ns clock periods and encoded in bits 23-21 of the channel bit
+    mask, 001 for one period up to 100 for four, and the instruction
+    itself runs for the minimum instruction time. Returns the channel
+    bit masks, the instruction durations and the snapped durations.
+    """
+    # Bins 1 to 5 are the short pulse lengths (0, 3], (3, 5], (5, 7],
+    # (7, 9] and (9, 10) ns, bin 0 holds all other pulses.
+    short_pulse_bin = np.digitize(durations, _SHORT_PULSE_EDGES, right=True)
+    short_pulse_bin[durations >= 0.01] = 0
+    short_pulse_bits = _SHORT_PULSE_BITS[short_pulse_bin]
+    snapped_durations = np.where(
+        short_pulse_bin > 0, _SHORT_PULSE_SNAP[short_pulse_bin], durations
+    )
+    instruction_durations = np.where(durations < 0.01, min_instr_clk_cycles, durations)
+    return masks + short_pulse_bits, instruction_durations, snapped_durations
+
+
+if njit is not None:
+
+    @njit(cache=True)
+    def _classify_pulses(
+        durations: np.ndarray, masks: np.ndarray, min_instr_clk_cycles: int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        out_masks = masks.copy()
+        instruction_durations = durations.copy()
+        snapped_durations = durations.copy()
+        for i in range(durations.size):
+            duration = durations[i]
+            if duration >= 0.01:
+                continue
+            instruction_durations[i] = min_instr_clk_cycles
+            if duration > 0:
+                short_pulse_bin = (
+                    1
+                    + (duration > 0.003)
+                    + (duration > 0.005)
+                    + (duration > 0.007)
+                    + (duration > 0.009)
+                )
+                out_masks[i] += _SHORT_PULSE_BITS[short_pulse_bin]
+                snapped_durations[i] = _SHORT_PULSE_SNAP[short_pulse_bin]
+        return out_masks, instruction_durations, snapped_durations
+
+else:
+    _classify_pulses = _classify_pulses_numpy
 
 
 class PulseBlaster(Synchroniser):
@@ -924,7 +1153,7 @@ class PulseBlaster(Synchroniser):
         minimum instruction clock cycle and PB channel connections.
 
         """
-        if spapi is None:
+        if spapi is None or not spapi.spinapi_available():
             raise RuntimeError(
                 "This class requires 'spinapi' by SpinCore to be installed and functional"
             )
@@ -947,6 +1176,10 @@ class PulseBlaster(Synchroniser):
 
     def open(self) -> None:
         self.configure_pb()
+        # Compiles the pulse classifier now instead of on the first upload.
+        _classify_pulses(
+            np.zeros(1), np.zeros(1, dtype=np.int64), self.pb_min_instr_clk_cycles
+        )
 
     def load_sequence(self) -> None:
         yaml_sequence_transpiler = PulseBlasterSequence(self.channel_mapping)
@@ -1017,7 +1250,10 @@ class PulseBlaster(Synchroniser):
         # Configure the core clock frequency (in MHz)
         spapi.pb_core_clock(self.samprate)
 
-    def pb_inst_pbonly(flags, instruction, instruction_data, pulse_length):
+    @staticmethod
+    def pb_inst_pbonly(
+        flags: int, instruction: int, instruction_data: int, pulse_length: float
+    ) -> int:
         """
         Create single instruction to send to the pulse program. It returns a negative number on an error, or the instruction number upon success.
         If the function returns -99, an invalid parameter was passed to the function.
@@ -1035,10 +1271,7 @@ class PulseBlaster(Synchroniser):
             int status: current PB board status
         """
         return spapi.spinapi.pb_inst_pbonly(
-            ct.c_uint(flags),
-            ct.c_int(instruction),
-            ct.c_int(instruction_data),
-            ct.c_double(pulse_length),
+            flags, instruction, instruction_data, pulse_length
         )
 
     def check_pulse_length_short(
@@ -1062,88 +1295,62 @@ class PulseBlaster(Synchroniser):
         """
         self.start_programming()
 
+        mask_array, pulse_durations, snapped_durations = _classify_pulses(
+            np.asarray(pulse_duration_list, dtype=np.float64),
+            np.asarray(channel_bit_masks, dtype=np.int64),
+            self.pb_min_instr_clk_cycles,
+        )
+        snapped = np.flatnonzero(snapped_durations != pulse_duration_list)
+        if len(snapped):
+            logging.warning(
+                f"{len(snapped)} pulse durations not possible with PB card, e.g. "
+                f"{pulse_duration_list[snapped[0]]}. Setting to multiples of "
+                f"the clock period, e.g. {snapped_durations[snapped[0]]}"
+            )
+
+        # Time resolution of PulseBlaster, given by 1/(clock frequency):
+        # t_min = 1e3/self.samprate  # in ns
+        # upload times as is
+        t_min = 1
+
         # Send instructions to the pulse program
         # Instruction format:
         # int status pb_inst_pbonly(int bit flags, int instruction,
         # int instruction_data, int pulse_length)
-        for i, pulse_duration in zip(
-            range(len(channel_bit_masks)), pulse_duration_list
-        ):
-            # All pulse duration checks in mus.
-            if pulse_duration >= 0.01:
-                channel_bit_mask = channel_bit_masks[i]
-            else:
-                # Short Pulse Feature:
-                # bits 23-21 controls the number of clock periods
-                if 0 < pulse_duration <= 0.003:
-                    # 001 for 1 clock period, 2ns for 500 MHz
-                    pulse_duration = self.check_pulse_length_short(
-                        pulse_duration, 0.002
-                    )
-                    channel_bit_mask = channel_bit_masks[i] + 2**21
-                elif 0.003 < pulse_duration <= 0.005:
-                    # 010 for 2 clock periods
-                    pulse_duration = self.check_pulse_length_short(
-                        pulse_duration, 0.004
-                    )
-                    channel_bit_mask = channel_bit_masks[i] + 2**22
-                elif 0.005 < pulse_duration <= 0.007:
-                    # 011 for 3 clock periods
-                    pulse_duration = self.check_pulse_length_short(
-                        pulse_duration, 0.006
-                    )
-                    channel_bit_mask = channel_bit_masks[i] + 2**21 + 2**22
-                elif 0.007 < pulse_duration <= 0.009:
-                    # 100 for 4 clock periods
-                    pulse_duration = self.check_pulse_length_short(
-                        pulse_duration, 0.008
-                    )
-                    channel_bit_mask = channel_bit_masks[i] + 2**23
-                elif 0.009 < pulse_duration < 0.01:
-                    # 100 for 4 clock periods
-                    pulse_duration = self.check_pulse_length_short(
-                        pulse_duration, 0.01)
-                    channel_bit_mask = channel_bit_masks[i]
-
-                # Shortest minimum instruction time is 5 clock periods
-                # i.e. 10 ns for 500 MHz
-                pulse_duration = self.pb_min_instr_clk_cycles
-
-            # Time resolution of PulseBlaster, given by 1/(clock frequency):
-            # t_min = 1e3/self.samprate  # in ns
-            # upload times as is
-            t_min = 1
-
-            # Instructions for pulse sequence
-            if i == 0:
-                start_instr_num = spapi.pb_inst_pbonly(
-                    channel_bit_mask,
-                    spapi.Inst.CONTINUE,
-                    0,
-                    pulse_duration * t_min * spapi.us,
+        pb_inst_pbonly = PulseBlaster.pb_inst_pbonly
+        inst_continue = spapi.Inst.CONTINUE
+        error_catcher = self.error_catcher
+        unit = t_min * spapi.us
+        # Plain Python columns in device units, the FFI calls below take
+        # their elements as they are.
+        durations = (pulse_durations * unit).tolist()
+        masks = mask_array.tolist()
+        n_instructions = len(durations)
+        if n_instructions:
+            start_instr_num = pb_inst_pbonly(masks[0], inst_continue, 0, durations[0])
+            error_catcher(start_instr_num)
+        if n_instructions > 2:
+            # All instructions in between continue to the next one and are
+            # sent in one go.
+            error_catcher(
+                spapi.pb_inst_pbonly_batch(
+                    masks[1:-1], repeat(inst_continue), repeat(0), durations[1:-1]
                 )
-                self.error_catcher(start_instr_num)
-            elif i != len(channel_bit_masks) - 1:
-                status = spapi.pb_inst_pbonly(
-                    channel_bit_mask,
-                    spapi.Inst.CONTINUE,
-                    0,
-                    pulse_duration * t_min * spapi.us,
-                )
-                self.error_catcher(status)
-            else:
-                status = spapi.pb_inst_pbonly(
-                    channel_bit_mask,
+            )
+        if n_instructions > 1:
+            # The last instruction branches back to the first one.
+            error_catcher(
+                pb_inst_pbonly(
+                    masks[-1],
                     spapi.Inst.BRANCH,
                     start_instr_num,
-                    pulse_duration * t_min * spapi.us,
+                    durations[-1],
                 )
-                self.error_catcher(status)
+            )
 
-        status = spapi.pb_inst_pbonly(
-            0, spapi.Inst.STOP, 0, self.pb_min_instr_clk_cycles * t_min * spapi.us
+        error_catcher(
+            pb_inst_pbonly(0, spapi.Inst.STOP, 0, self.pb_min_instr_clk_cycles * unit)
         )
-        self.error_catcher(status)
 
         self.stop_programming()
         print(colored("Pulse sequence is loaded to Pulseblaster card!", "green"))
@@ -5,37 +5,149 @@ an output power are unified by storing the device speicif commands in a
 dictionary for each device.
 """
 
+import atexit
+from contextlib import contextmanager
+from functools import lru_cache
 from time import sleep
 import logging
-from typing import Dict
+from typing import Any, Dict, Iterator, List, Optional, cast
 import pyvisa
+from pyvisa.resources import MessageBasedResource
 from qupyt.mixins import ConfigurationError
 
 
+@lru_cache(maxsize=1)
+def _visa_rm() -> pyvisa.ResourceManager:
+    """
+    Shared resource manager of all VISA devices. Initialising the
+    VISA backend is expensive, it is done once and closed at exit.
+    """
+    resource_manager = pyvisa.ResourceManager()
+    atexit.register(resource_manager.close)
+    return resource_manager
+
+
+_SRS_CMDS: Dict[str, str] = {
+    "SetAmpl1": "AMPR ",
+    "GetAmpl1": "AMPR?",
+    "SetFreq1": "FREQ ",
+    "GetFreq1": "FREQ?",
+    "OPC": "*OPC?",
+    "Sep": ";",
+}
+
+_SMB_CMDS: Dict[str, str] = {
+    "SetAmpl1": "POW ",
+    "GetAmpl1": "POW?",
+    "SetFreq1": "FREQ ",
+    "GetFreq1": "FREQ?",
+    "SetFreqList1": "SOURce1:LIST:FREQ ",
+    "OPC": "*OPC?",
+    "Sep": ";:",
+}
+
+_RIGOL_CMDS: Dict[str, str] = {
+    "OPC": "*OPC?",
+    "Sep": ";:",
+    "GetAmpl1": "VOLT?",
+    "SetAmpl1": "VOLT ",
+    "SetPhase1": "BURS:PHAS ",
+    "GetPhase1": "BURS:PHAS?",
+    "GetFreq1": "FREQ?",
+    "SetFreq1": "FREQ ",
+    "GetNCycles1": "BURS:NCYC?",
+    "SetNCycles1": "BURS:NCYC ",
+    "SetBurstMode1": "BURS:MODE ",
+    "SetBurstState1": "BURS:STAT ",
+    "GetBurstMode1": "BURS:MODE?",
+    "Outp1": "OUTP ",
+    "GetOutp1": "OUTP?",
+    "GetAmpl2": "SOUR2:VOLT?",
+    "SetAmpl2": "SOUR2:VOLT ",
+    "SetPhase2": "SOUR2:BURS:PHAS ",
+    "GetPhase2": "SOUR2:BURS:PHAS?",
+    "GetFreq2": "SOUR2:FREQ?",
+    "SetFreq2": "SOUR2:FREQ ",
+    "GetNCycles2": "SOUR2:BURS:NCYC?",
+    "SetNCycles2": "SOUR2:BURS:NCYC ",
+    "SetBurstMode2": "SOUR2:BURS:MODE ",
+    "SetBurstState2": "SOUR2:BURS:STAT ",
+    "GetBurstMode2": "SOUR2:BURS:MODE?",
+    "Outp2": "OUTP2 ",
+    "GetOutp2": "OUTP2?",
+}
+
+_TEKAWG_CMDS: Dict[str, str] = {"OPC": "*OPC?", "Sep": ";:"}
+
+_TEKAFG_CMDS: Dict[str, str] = {
+    "SetAmpl1": "SOURce1:VOLTage:LEVel:IMMediate:AMPLitude ",
+    "GetAmpl1": "SOURce1:VOLTage:LEVel:IMMediate:AMPLitude?",
+    "SetFreq1": "SOURce1:FREQuency:FIXed ",
+    "GetFreq1": "SOURce1:FREQuency:FIXed?",
+    # The Tek AFG does not implement an OPC.
+    # We therefore skip the waiting time and
+    # Query impedance which will alwasy return
+    # Non zeros numbers.
+    "OPC": "OUTPut1:IMPedance?",
+    "Sep": ";:",
+}
+
+# Device specific commands, keyed by the source type.
+_COMMANDS: Dict[str, Dict[str, str]] = {
+    "SRS": _SRS_CMDS,
+    "SMB": _SMB_CMDS,
+    "Rigol": _RIGOL_CMDS,
+    "TekAWG": _TEKAWG_CMDS,
+    "TekAFG": _TEKAFG_CMDS,
+}
+
+# Devices without a real OPC. Their "OPC" command is a query that
+# always returns a non zero value, opc_wait skips it by default.
+_NO_OPC_TYPES = frozenset(("TekAFG",))
+
+# The same commands pre-encoded for write_value.
+_ENCODED_COMMANDS: Dict[str, Dict[str, bytes]] = {
+    s_type: {key: cmd.encode("ascii") for key, cmd in commands.items()}
+    for s_type, commands in _COMMANDS.items()
+}
+
+
 class VisaObject:
     """
     Visa class acting as parent for all devices intended
     to connect via the VISA protocol.
     """
 
+    # Maximum number of commands joined into a single write by
+    # write_batch, keeping every write well below input buffer limits.
+    batch_size = 100
+
     def __init__(self, handle: str, s_type: str) -> None:
         """
         handle: visa adress of signal source
         s_type: source type (SRS, RS)...
         """
-        self.known_s_types = ["SRS", "SMB", "Rigol", "TekAWG", "TekAFG"]
         self.handle = handle
         self.s_type = s_type
-        if self.s_type not in self.known_s_types:
+        if self.s_type not in _COMMANDS:
             raise ConfigurationError(
-                "the VISA device type", self.s_type, self.known_s_types
+                "the VISA device type", self.s_type, list(_COMMANDS)
             )
         self.command: Dict[str, str]
+        self._command_bytes: Dict[str, bytes]
         self._get_instructions()
+        # Resolved once, opc_wait polls with it.
+        self._opc_cmd = self.command["OPC"]
+        self._skip_opc = self.s_type in _NO_OPC_TYPES
+        self._defer_opc = False
+        # Commands queued inside a batched() block, None outside of it.
+        self._pending: Optional[List[str]] = None
         try:
-            resource_manager = pyvisa.ResourceManager()
-            self.instance = resource_manager.open_resource(handle)
+            # All supported devices are message based (SCPI over GPIB,
+            # USB or TCP/IP), open_resource is only typed as Resource.
+            self.instance = cast(MessageBasedResource, _visa_rm().open_resource(handle))
             self.instance.timeout = 60000
+            self._termination = (self.instance.write_termination or "").encode()
             logging.info(
                 f"Opening {s_type} at adress {handle}".ljust(
                     65, ".") + "[done]"
@@ -45,8 +157,6 @@ class VisaObject:
                 f"Opening {s_type} at adress {handle}".ljust(
                     65, ".") + "[failed]"
             )
-            resource_manager.close()
-            resource_manager.visalib._registry.clear()
             raise exc
 
     def __repr__(self) -> str:
@@ -60,81 +170,117 @@ class VisaObject:
         Get set of instructions depending
         on type of signal source.
         """
-        if self.s_type == "SRS":
-            self.command = {
-                "SetAmpl1": "AMPR ",
-                "GetAmpl1": "AMPR?",
-                "SetFreq1": "FREQ ",
-                "GetFreq1": "FREQ?",
-                "OPC": "*OPC?",
-            }
-
-        elif self.s_type == "SMB":
-            self.command = {
-                "SetAmpl1": "POW ",
-                "GetAmpl1": "POW?",
-                "SetFreq1": "FREQ ",
-                "GetFreq1": "FREQ?",
-                "OPC": "*OPC?",
-            }
-
-        elif self.s_type == "Rigol":
-            self.command = {
-                "OPC": "*OPC?",
-                "GetAmpl1": "VOLT?",
-                "SetAmpl1": "VOLT ",
-                "SetPhase1": "BURS:PHAS ",
-                "GetPhase1": "BURS:PHAS?",
-                "GetFreq1": "FREQ?",
-                "SetFreq1": "FREQ ",
-                "GetNCycles1": "BURS:NCYC?",
-                "SetNCycles1": "BURS:NCYC ",
-                "SetBurstMode1": "BURS:MODE ",
-                "SetBurstState1": "BURS:STAT ",
-                "GetBurstMode1": "BURS:MODE?",
-                "Outp1": "OUTP ",
-                "GetOutp1": "OUTP?",
-                "GetAmpl2": "SOUR2:VOLT?",
-                "SetAmpl2": "SOUR2:VOLT ",
-                "SetPhase2": "SOUR2:BURS:PHAS ",
-                "GetPhase2": "SOUR2:BURS:PHAS?",
-                "GetFreq2": "SOUR2:FREQ?",
-                "SetFreq2": "SOUR2:FREQ ",
-                "GetNCycles2": "SOUR2:BURS:NCYC?",
-                "SetNCycles2": "SOUR2:BURS:NCYC ",
-                "SetBurstMode2": "SOUR2:BURS:MODE ",
-                "SetBurstState2": "SOUR2:BURS:STAT ",
-                "GetBurstMode2": "SOUR2:BURS:MODE?",
-                "Outp2": "OUTP2 ",
-                "GetOutp2": "OUTP2?",
-            }
-
-        elif self.s_type == "TekAWG":
-            self.command = {"OPC": "*OPC?"}
-
-        elif self.s_type == "TekAFG":
-            self.command = {
-                "SetAmpl1": "SOURce1:VOLTage:LEVel:IMMediate:AMPLitude ",
-                "GetAmpl1": "SOURce1:VOLTage:LEVel:IMMediate:AMPLitude?",
-                "SetFreq1": "SOURce1:FREQuency:FIXed ",
-                "GetFreq1": "SOURce1:FREQuency:FIXed?",
-                # The Tek AFG does not implement an OPC.
-                # We therefore skip the waiting time and
-                # Query impedance which will alwasy return
-                # Non zeros numbers.
-                "OPC": "OUTPut1:IMPedance?",
-            }
-
-    def opc_wait(self) -> None:
+        self.command = _COMMANDS[self.s_type]
+        self._command_bytes = _ENCODED_COMMANDS[self.s_type]
+
+    def opc_wait(self, force: bool = False) -> None:
         """
         Check if the device has finished all tasks and is
         ready to execute the next command.
-        Pauses execution until the device is ready.
+        Pauses execution until the device is ready, polling at
+        intervals growing from 200 us to 50 ms.
+        Returns immediately inside a :meth:`deferred_opc` or
+        :meth:`batched` block, and for devices without an OPC
+        (TekAFG), whose substitute query always succeeds at once.
+        Pass force=True to send that query anyway.
+        """
+        if self._defer_opc or self._pending is not None:
+            return
+        if self._skip_opc and not force:
+            return
+        # Poll with exponential backoff: fast commands are picked up
+        # within a fraction of a millisecond, slow ones are not flooded
+        # with queries.
+        delay = 200e-6
+        while int(self.instance.query(self._opc_cmd)) == 0:
+            sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+    @contextmanager
+    def deferred_opc(self) -> Iterator[None]:
         """
-        opc_val = 0
-        while opc_val == 0:
-            opc = self.instance.query(self.command["OPC"])
-            opc_val = int(opc)
+        Context manager to send many commands and wait for the device
+        only once. Every :meth:`opc_wait` inside the block is skipped,
+        and a single one is issued on exit.
+
+        Example:
+            >>> with source.deferred_opc():
+            ...     source.set_frequency(2.87e9)
+            ...     source.set_amplitude(-10)
+        """
+        if self._defer_opc:
+            # Nested use, the outermost block waits.
+            yield
+            return
+        self._defer_opc = True
+        try:
+            yield
+        finally:
+            self._defer_opc = False
+        self.opc_wait()
+
+    def write_cmd(self, cmd: str) -> None:
+        """
+        Sends a single command, or queues it if called inside a
+        :meth:`batched` block.
+        """
+        if self._pending is not None:
+            self._pending.append(cmd)
+        else:
+            self.instance.write(cmd)
+
+    def write_value(self, key: str, value: Any) -> None:
+        """
+        Sends the command stored under key followed by value, e.g.
+        ``write_value("SetFreq1", 2.87e9)``. The command is taken
+        pre-encoded and written raw, or queued if called inside a
+        :meth:`batched` block.
+        """
+        if self._pending is not None:
+            self._pending.append(self.command[key] + str(value))
+        else:
+            payload: bytes = (
+                self._command_bytes[key]
+                + str(value).encode("ascii")
+                + self._termination
+            )
+            self.instance.write_raw(payload)
+
+    def write_batch(self, cmds: List[str]) -> None:
+        """
+        Sends several commands as compound commands of up to
+        :attr:`batch_size` commands each, joined by the separator of the
+        device, and waits for the device once.
+        """
+        separator = self.command["Sep"]
+        for start in range(0, len(cmds), self.batch_size):
+            self.instance.write(separator.join(cmds[start : start + self.batch_size]))
+        self.opc_wait()
+
+    @contextmanager
+    def batched(self) -> Iterator[None]:
+        """
+        Context manager collecting all commands sent through
+        :meth:`write_cmd` and sending them in a single write with a
+        single :meth:`opc_wait` on exit. Commands are sent in the
+        order they were issued.
+
+        Example:
+            >>> with source.batched():
+            ...     source.set_frequency(2.87e9)
+            ...     source.set_amplitude(-10)
+        """
+        if self._pending is not None:
+            # Nested use, the outermost block sends.
+            yield
+            return
+        self._pending = []
+        try:
+            yield
+        finally:
+            pending, self._pending = self._pending, None
+        if pending:
+            self.write_batch(pending)
 
     def close(self) -> None:
         if self.s_type == "TekAWG":
@@ -24,19 +24,21 @@
 # The changes made consiste mainly in formatting and type hints.
 
 import ctypes
-from typing import Any
+import os
+from functools import lru_cache
+from typing import Any, Callable, Iterable, Optional
 import logging
 
-PULSE_PROGRAM = 0
-FREQ_REGS = 1
+import numpy as np
 
+njit: Optional[Callable[..., Any]]
 try:
-    spinapi = ctypes.CDLL("spinapi64")
-except:
-    try:
-        spinapi = ctypes.CDLL("spinapi")
-    except Exception:
-        logging.warning("Falied to load spinapi DLL".ljust(65, ".") + "[failed]")
+    from numba import njit
+except ImportError:
+    njit = None
+
+PULSE_PROGRAM = 0
+FREQ_REGS = 1
 
 
 def enum(**enums: Any) -> type:
@@ -140,344 +142,415 @@ OVERFLOW_RESET = 0x4000
 RAM_DIRECT = 0x8000 | BYPASS_CIC | BYPASS_FIR | BYPASS_MULT
 
 
-spinapi.pb_get_version.restype = ctypes.c_char_p
-spinapi.pb_get_error.restype = ctypes.c_char_p
+@lru_cache(maxsize=1)
+def _get_spinapi() -> ctypes.CDLL:
+    """
+    Loads the SpinAPI library on first use and declares the prototypes
+    of its functions. Raises a RuntimeError if it cannot be found.
+    """
+    try:
+        spinapi = ctypes.CDLL("spinapi64")
+    except OSError:
+        try:
+            spinapi = ctypes.CDLL("spinapi")
+        except OSError as exc:
+            logging.warning("Falied to load spinapi DLL".ljust(65, ".") + "[failed]")
+            raise RuntimeError("SpinAPI library not found") from exc
 
-spinapi.pb_count_boards.restype = ctypes.c_int
+    # Prototypes of the SpinAPI functions. With argtypes set, ctypes
+    # converts plain Python ints and floats without wrapping them by hand.
+    spinapi.pb_get_version.restype = ctypes.c_char_p
+    spinapi.pb_get_error.restype = ctypes.c_char_p
 
-spinapi.pb_init.restype = ctypes.c_int
+    spinapi.pb_count_boards.restype = ctypes.c_int
 
-spinapi.pb_select_board.argtype = ctypes.c_int
-spinapi.pb_select_board.restype = ctypes.c_int
+    spinapi.pb_init.restype = ctypes.c_int
 
-spinapi.pb_set_debug.argtype = ctypes.c_int
-spinapi.pb_set_debug.restype = ctypes.c_int
+    spinapi.pb_select_board.argtypes = (ctypes.c_int,)
+    spinapi.pb_select_board.restype = ctypes.c_int
 
-spinapi.pb_set_defaults.restype = ctypes.c_int
+    spinapi.pb_set_debug.argtypes = (ctypes.c_int,)
+    spinapi.pb_set_debug.restype = ctypes.c_int
 
-spinapi.pb_set_freq.argtype = ctypes.c_double
-spinapi.pb_set_freq.restype = ctypes.c_int
+    spinapi.pb_set_defaults.restype = ctypes.c_int
 
-spinapi.pb_set_phase.argtype = ctypes.c_double
-spinapi.pb_set_phase.restype = ctypes.c_int
+    spinapi.pb_set_freq.argtypes = (ctypes.c_double,)
+    spinapi.pb_set_freq.restype = ctypes.c_int
 
-spinapi.pb_set_amp.argtype = ctypes.c_float, ctypes.c_int
-spinapi.pb_set_amp.restype = ctypes.c_int
+    spinapi.pb_set_phase.argtypes = (ctypes.c_double,)
+    spinapi.pb_set_phase.restype = ctypes.c_int
 
-spinapi.pb_overflow.argtype = ctypes.c_int, ctypes.c_int
-spinapi.pb_overflow.restype = ctypes.c_int
+    spinapi.pb_set_amp.argtypes = ctypes.c_float, ctypes.c_int
+    spinapi.pb_set_amp.restype = ctypes.c_int
 
-spinapi.pb_scan_count.argtype = ctypes.c_int
-spinapi.pb_scan_count.restype = ctypes.c_int
+    spinapi.pb_overflow.argtypes = (
+        ctypes.c_int,  # reset
+        ctypes.c_void_p,  # PB_OVERFLOW_STRUCT *of
+    )
+    spinapi.pb_overflow.restype = ctypes.c_int
 
-spinapi.pb_set_num_points.argtype = ctypes.c_int
-spinapi.pb_set_num_points.restype = ctypes.c_int
+    spinapi.pb_scan_count.argtypes = (ctypes.c_int,)
+    spinapi.pb_scan_count.restype = ctypes.c_int
 
-spinapi.pb_set_radio_control.argtype = ctypes.c_int
-spinapi.pb_set_radio_control.restype = ctypes.c_int
+    spinapi.pb_set_num_points.argtypes = (ctypes.c_int,)
+    spinapi.pb_set_num_points.restype = ctypes.c_int
 
-spinapi.pb_core_clock.argtype = ctypes.c_double
-spinapi.pb_core_clock.restype = ctypes.c_int
+    spinapi.pb_set_radio_control.argtypes = (ctypes.c_int,)
+    spinapi.pb_set_radio_control.restype = ctypes.c_int
 
-spinapi.pb_write_register.argtype = ctypes.c_int, ctypes.c_int
-spinapi.pb_write_register.restype = ctypes.c_int
+    spinapi.pb_core_clock.argtypes = (ctypes.c_double,)
+    spinapi.pb_core_clock.restype = ctypes.c_int
 
-spinapi.pb_start_programming.argtype = ctypes.c_int
-spinapi.pb_start_programming.restype = ctypes.c_int
+    spinapi.pb_write_register.argtypes = ctypes.c_int, ctypes.c_int
+    spinapi.pb_write_register.restype = ctypes.c_int
 
-spinapi.pb_stop_programming.restype = ctypes.c_int
+    spinapi.pb_start_programming.argtypes = (ctypes.c_int,)
+    spinapi.pb_start_programming.restype = ctypes.c_int
 
-spinapi.pb_start.restype = ctypes.c_int
+    spinapi.pb_stop_programming.restype = ctypes.c_int
 
-spinapi.pb_stop.restype = ctypes.c_int
+    spinapi.pb_start.restype = ctypes.c_int
 
-spinapi.pb_reset.restype = ctypes.c_int
+    spinapi.pb_stop.restype = ctypes.c_int
 
-spinapi.pb_close.restype = ctypes.c_int
+    spinapi.pb_reset.restype = ctypes.c_int
 
-spinapi.pb_read_status.restype = ctypes.c_int
+    spinapi.pb_close.restype = ctypes.c_int
 
-spinapi.pb_status_message.restype = ctypes.c_char_p
+    spinapi.pb_read_status.restype = ctypes.c_int
 
-spinapi.pb_get_firmware_id.restype = ctypes.c_int
+    spinapi.pb_status_message.restype = ctypes.c_char_p
 
-spinapi.pb_sleep_ms.argtype = ctypes.c_int
-spinapi.pb_sleep_ms.restype = ctypes.c_int
+    spinapi.pb_get_firmware_id.restype = ctypes.c_int
 
-spinapi.pb_get_data.argtype = (
-    ctypes.c_int,  # num_points Number of complex points to read from RAM
-    # real_data Real data from RAM is stored into this array
-    ctypes.POINTER(ctypes.c_int),
-    # imag_data Imag data from RAM is stored into this array
-    ctypes.POINTER(ctypes.c_int),
-)
-spinapi.pb_get_data.restype = ctypes.c_int
+    spinapi.pb_sleep_ms.argtypes = (ctypes.c_int,)
+    spinapi.pb_sleep_ms.restype = ctypes.c_int
 
-spinapi.pb_get_data_direct.argtype = (ctypes.c_int, ctypes.POINTER(ctypes.c_short))
-spinapi.pb_get_data_direct.restype = ctypes.c_int
+    spinapi.pb_get_data.argtypes = (
+        ctypes.c_int,  # num_points Number of complex points to read from RAM
+        # real_data Real data from RAM is stored into this array
+        ctypes.POINTER(ctypes.c_int),
+        # imag_data Imag data from RAM is stored into this array
+        ctypes.POINTER(ctypes.c_int),
+    )
+    spinapi.pb_get_data.restype = ctypes.c_int
 
-spinapi.pb_unset_radio_control.argtype = ctypes.c_int
-spinapi.pb_unset_radio_control.restype = ctypes.c_int
+    spinapi.pb_get_data_direct.argtypes = (ctypes.c_int, ctypes.POINTER(ctypes.c_short))
+    spinapi.pb_get_data_direct.restype = ctypes.c_int
 
-spinapi.pb_inst_pbonly.argtype = (
-    ctypes.c_int,  # flags
-    ctypes.c_int,  # inst
-    ctypes.c_int,  # inst data
-    ctypes.c_double,  # length (double)
-)
-spinapi.pb_inst_pbonly.restype = ctypes.c_int
-
-spinapi.pb_dds_load.argtype = ctypes.c_float, ctypes.c_int
-spinapi.pb_dds_load.restype = ctypes.c_int
-
-spinapi.pb_inst_radio.argtype = (
-    ctypes.c_int,  # Frequency register
-    ctypes.c_int,  # Cosine phase
-    ctypes.c_int,  # Sin phase
-    ctypes.c_int,  # tx phase
-    ctypes.c_int,  # tx enable
-    ctypes.c_int,  # phase reset
-    ctypes.c_int,  # trigger scan
-    ctypes.c_int,  # flags
-    ctypes.c_int,  # inst
-    ctypes.c_int,  # inst data
-    ctypes.c_double,  # length (double)
-)
-spinapi.pb_inst_radio.restype = ctypes.c_int
-
-spinapi.pb_inst_radio_shape.argtype = (
-    ctypes.c_int,  # Frequency register
-    ctypes.c_int,  # cos phase
-    ctypes.c_int,  # sin phase
-    ctypes.c_int,  # tx phase
-    ctypes.c_int,  # tx enable
-    ctypes.c_int,  # phase reset
-    ctypes.c_int,  # trigger scan
-    ctypes.c_int,  # useshape
-    ctypes.c_int,  # amp
-    ctypes.c_int,  # flags
-    ctypes.c_int,  # inst
-    ctypes.c_int,  # inst data
-    ctypes.c_double,  # length (double)
-)
-spinapi.pb_inst_radio_shape.restype = ctypes.c_int
-
-spinapi.pb_inst_dds2.argtype = (
-    ctypes.c_int,  # Frequency register DDS0
-    ctypes.c_int,  # Phase register DDS0
-    ctypes.c_int,  # Amplitude register DDS0
-    ctypes.c_int,  # Output enable DDS0
-    ctypes.c_int,  # Phase reset DDS0
-    ctypes.c_int,  # Frequency register DDS1
-    ctypes.c_int,  # Phase register DDS1
-    ctypes.c_int,  # Amplitude register DDS1
-    ctypes.c_int,  # Output enable DDS1,
-    ctypes.c_int,  # Phase reset DDS1,
-    ctypes.c_int,  # Flags
-    ctypes.c_int,  # inst
-    ctypes.c_int,  # inst data
-    ctypes.c_double,  # timing value (double)
-)
-spinapi.pb_inst_dds2.restype = ctypes.c_int
-
-spinapi.pb_write_felix.argtype = (
-    ctypes.c_char_p,  # fnameout The filename for the Felix file you want to create
-    ctypes.c_char_p,  # title_string 	Large string with all parameter information to include in Felix Title Block
-    ctypes.c_int,  # num_points Number of points to write to the file
-    ctypes.c_float,  # SW Spectral width of the baseband data in Hz
-    ctypes.c_float,  # SF Spectrometer frequency in MHz
-    ctypes.c_int,  # real_data Integer array containing the real portion of the data points
-    ctypes.c_int,  # imag_data Integer array containing the imaginary portion of the data points
-)
-spinapi.pb_write_felix.restype = ctypes.c_int
+    spinapi.pb_unset_radio_control.argtypes = (ctypes.c_int,)
+    spinapi.pb_unset_radio_control.restype = ctypes.c_int
+
+    spinapi.pb_inst_pbonly.argtypes = (
+        ctypes.c_uint,  # flags
+        ctypes.c_int,  # inst
+        ctypes.c_int,  # inst data
+        ctypes.c_double,  # length (double)
+    )
+    spinapi.pb_inst_pbonly.restype = ctypes.c_int
+
+    spinapi.pb_dds_load.argtypes = ctypes.POINTER(ctypes.c_float), ctypes.c_int
+    spinapi.pb_dds_load.restype = ctypes.c_int
+
+    spinapi.pb_inst_radio.argtypes = (
+        ctypes.c_int,  # Frequency register
+        ctypes.c_int,  # Cosine phase
+        ctypes.c_int,  # Sin phase
+        ctypes.c_int,  # tx phase
+        ctypes.c_int,  # tx enable
+        ctypes.c_int,  # phase reset
+        ctypes.c_int,  # trigger scan
+        ctypes.c_int,  # flags
+        ctypes.c_int,  # inst
+        ctypes.c_int,  # inst data
+        ctypes.c_double,  # length (double)
+    )
+    spinapi.pb_inst_radio.restype = ctypes.c_int
+
+    spinapi.pb_inst_radio_shape.argtypes = (
+        ctypes.c_int,  # Frequency register
+        ctypes.c_int,  # cos phase
+        ctypes.c_int,  # sin phase
+        ctypes.c_int,  # tx phase
+        ctypes.c_int,  # tx enable
+        ctypes.c_int,  # phase reset
+        ctypes.c_int,  # trigger scan
+        ctypes.c_int,  # useshape
+        ctypes.c_int,  # amp
+        ctypes.c_int,  # flags
+        ctypes.c_int,  # inst
+        ctypes.c_int,  # inst data
+        ctypes.c_double,  # length (double)
+    )
+    spinapi.pb_inst_radio_shape.restype = ctypes.c_int
+
+    spinapi.pb_inst_dds2.argtypes = (
+        ctypes.c_int,  # Frequency register DDS0
+        ctypes.c_int,  # Phase register DDS0
+        ctypes.c_int,  # Amplitude register DDS0
+        ctypes.c_int,  # Output enable DDS0
+        ctypes.c_int,  # Phase reset DDS0
+        ctypes.c_int,  # Frequency register DDS1
+        ctypes.c_int,  # Phase register DDS1
+        ctypes.c_int,  # Amplitude register DDS1
+        ctypes.c_int,  # Output enable DDS1,
+        ctypes.c_int,  # Phase reset DDS1,
+        ctypes.c_int,  # Flags
+        ctypes.c_int,  # inst
+        ctypes.c_int,  # inst data
+        ctypes.c_double,  # timing value (double)
+    )
+    spinapi.pb_inst_dds2.restype = ctypes.c_int
+
+    spinapi.pb_write_felix.argtypes = (
+        ctypes.c_char_p,  # fnameout The filename for the Felix file you want to create
+        ctypes.c_char_p,  # title_string 	Large string with all parameter information to include in Felix Title Block
+        ctypes.c_int,  # num_points Number of points to write to the file
+        ctypes.c_float,  # SW Spectral width of the baseband data in Hz
+        ctypes.c_float,  # SF Spectrometer frequency in MHz
+        # real_data Integer array containing the real portion of the data points
+        ctypes.POINTER(ctypes.c_int),
+        # imag_data Integer array containing the imaginary portion of the data points
+        ctypes.POINTER(ctypes.c_int),
+    )
+    spinapi.pb_write_felix.restype = ctypes.c_int
+
+    spinapi.pb_setup_filters.argtypes = (
+        ctypes.c_double,  # spectral_width
+        ctypes.c_int,  # scan_repetitions
+        ctypes.c_int,  # cmd
+    )
+    spinapi.pb_setup_filters.restype = ctypes.c_int
+
+    spinapi.pb_inst_radio_shape_cyclops.argtypes = (
+        ctypes.c_int,  # Frequency register
+        ctypes.c_int,  # cos phase
+        ctypes.c_int,  # sin phase
+        ctypes.c_int,  # tx phase
+        ctypes.c_int,  # tx enable
+        ctypes.c_int,  # phase reset
+        ctypes.c_int,  # trigger scan
+        ctypes.c_int,  # useshape
+        ctypes.c_int,  # amp
+        ctypes.c_int,  # real_add_sub
+        ctypes.c_int,  # imag_add_sub
+        ctypes.c_int,  # channel_swap
+        ctypes.c_int,  # flags
+        ctypes.c_int,  # inst
+        ctypes.c_int,  # inst data
+        ctypes.c_double,  # length (double)
+    )
+    spinapi.pb_inst_radio_shape_cyclops.restype = ctypes.c_int
+
+    spinapi.pb_fft_find_resonance.argtypes = (
+        ctypes.c_int,  # num_points: Number of complex data points
+        # SF: Spectrometer Frequency used for the experiment (in Hz)
+        ctypes.c_double,
+        # SW: Spectral Width used for data acquisition (in Hz)
+        ctypes.c_double,
+        # real: Array of the real part of the complex data points
+        ctypes.POINTER(ctypes.c_int),
+        # imag: Array of the imaginary part of the complex data points
+        ctypes.POINTER(ctypes.c_int),
+    )
+    spinapi.pb_fft_find_resonance.restype = ctypes.c_double
+
+    spinapi.pb_write_ascii.argtypes = (
+        ctypes.c_char_p,  # fname
+        ctypes.c_int,  # num_points
+        ctypes.c_float,  # SW
+        ctypes.POINTER(ctypes.c_int),  # real_data
+        ctypes.POINTER(ctypes.c_int),  # imag_data
+    )
+    spinapi.pb_write_ascii.restype = ctypes.c_int
+
+    spinapi.pb_write_ascii_verbose.argtypes = (
+        ctypes.c_char_p,  # fname
+        ctypes.c_int,  # num_points
+        ctypes.c_float,  # SW
+        ctypes.c_float,  # SF
+        ctypes.POINTER(ctypes.c_int),  # real_data
+        ctypes.POINTER(ctypes.c_int),  # imag_data
+    )
+    spinapi.pb_write_ascii_verbose.restype = ctypes.c_int
+
+    spinapi.pb_write_jcamp.argtypes = (
+        ctypes.c_char_p,  # fname
+        ctypes.c_int,  # num_points
+        ctypes.c_float,  # SW
+        ctypes.c_float,  # SF
+        ctypes.POINTER(ctypes.c_int),  # real_data
+        ctypes.POINTER(ctypes.c_int),  # imag_data
+    )
+    spinapi.pb_write_jcamp.restype = ctypes.c_int
+
+    spinapi.pb_set_scan_segments.argtypes = (ctypes.c_int,)
+    spinapi.pb_set_scan_segments.restype = ctypes.c_int
+
+    return spinapi
+
+
+def spinapi_available() -> bool:
+    """Returns whether the SpinAPI library can be loaded."""
+    try:
+        _get_spinapi()
+    except RuntimeError:
+        return False
+    return True
+
+
+def __getattr__(name: str) -> Any:
+    # The library is exposed as the module attribute spinapi, loaded on
+    # first access.
+    if name == "spinapi":
+        return _get_spinapi()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-spinapi.pb_setup_filters.argtype = (
-    ctypes.c_double,  # spectral_width
-    ctypes.c_int,  # scan_repetitions
-    ctypes.c_int,  # cmd
-)
-spinapi.pb_setup_filters.restype = ctypes.c_int
-
-spinapi.pb_inst_radio_shape_cyclops.argtype = (
-    ctypes.c_int,  # Frequency register
-    ctypes.c_int,  # cos phase
-    ctypes.c_int,  # sin phase
-    ctypes.c_int,  # tx phase
-    ctypes.c_int,  # tx enable
-    ctypes.c_int,  # phase reset
-    ctypes.c_int,  # trigger scan
-    ctypes.c_int,  # useshape
-    ctypes.c_int,  # amp
-    ctypes.c_int,  # real_add_sub
-    ctypes.c_int,  # imag_add_sub
-    ctypes.c_int,  # channel_swap
-    ctypes.c_int,  # flags
-    ctypes.c_int,  # inst
-    ctypes.c_int,  # inst data
-    ctypes.c_double,  # length (double)
-)
-spinapi.pb_inst_radio_shape_cyclops.restype = ctypes.c_int
-
-spinapi.pb_fft_find_resonance.argtypes = (
-    ctypes.c_int,  # num_points: Number of complex data points
-    # SF: Spectrometer Frequency used for the experiment (in Hz)
-    ctypes.c_double,
-    # SW: Spectral Width used for data acquisition (in Hz)
-    ctypes.c_double,
-    # real: Array of the real part of the complex data points
-    ctypes.POINTER(ctypes.c_int),
-    # imag: Array of the imaginary part of the complex data points
-    ctypes.POINTER(ctypes.c_int),
-)
-spinapi.pb_fft_find_resonance.restype = ctypes.c_double
-
-spinapi.pb_write_ascii.argtype = (
-    ctypes.c_char_p,  # fname
-    ctypes.c_int,  # num_points
-    ctypes.c_float,  # SW
-    ctypes.POINTER(ctypes.c_int),  # real_data
-    ctypes.POINTER(ctypes.c_int),  # imag_data
-)
-spinapi.pb_write_ascii.restype = ctypes.c_int
-
-spinapi.pb_write_ascii_verbose.argtype = (
-    ctypes.c_char_p,  # fname
-    ctypes.c_int,  # num_points
-    ctypes.c_float,  # SW
-    ctypes.c_float,  # SF
-    ctypes.POINTER(ctypes.c_int),  # real_data
-    ctypes.POINTER(ctypes.c_int),  # imag_data
-)
-spinapi.pb_write_ascii_verbose.restype = ctypes.c_int
-
-spinapi.pb_write_jcamp.argtypes = (
-    ctypes.c_char_p,  # fname
-    ctypes.c_int,  # num_points
-    ctypes.c_float,  # SW
-    ctypes.c_float,  # SF
-    ctypes.POINTER(ctypes.c_int),  # real_data
-    ctypes.POINTER(ctypes.c_int),  # imag_data
-)
-spinapi.pb_write_jcamp.restype = ctypes.c_int
 
-spinapi.pb_set_scan_segments.argtype = ctypes.c_int
-spinapi.pb_set_scan_segments.restype = ctypes.c_int
+_C_INT_P = ctypes.POINTER(ctypes.c_int)
+_C_FLOAT_P = ctypes.POINTER(ctypes.c_float)
+
+
+def _c_int_array(values: Any, num_points: int) -> np.ndarray:
+    """
+    Returns values as a C contiguous numpy array of C ints, without a
+    copy if it already is one, e.g. np.intc or np.int32 data. Lists and
+    other arrays are converted in one vectorized step.
+    """
+    array = np.ascontiguousarray(values, dtype=np.intc)
+    if array.size < num_points:
+        raise ValueError(
+            f"Expected at least {num_points} data points, got {array.size}"
+        )
+    return array
 
 
 def pb_get_version() -> str:
     """Return library version as UTF-8 encoded string."""
-    ret = spinapi.pb_get_version()
+    ret = _get_spinapi().pb_get_version()
     return str(ctypes.c_char_p(ret).value.decode("utf-8"))
 
 
 def pb_get_error() -> str:
     """Return library error as UTF-8 encoded string."""
-    ret = spinapi.pb_get_error()
+    ret = _get_spinapi().pb_get_error()
     return str(ctypes.c_char_p(ret).value.decode("utf-8"))
 
 
 def pb_count_boards():
     """Return the number of boards detected in the system."""
-    return spinapi.pb_count_boards()
+    return _get_spinapi().pb_count_boards()
 
 
 def pb_init():
     """Initialize currently selected board."""
-    return spinapi.pb_init()
+    return _get_spinapi().pb_init()
 
 
 def pb_set_debug(debug):
-    return spinapi.pb_set_debug(debug)
+    return _get_spinapi().pb_set_debug(debug)
 
 
 def pb_select_board(board_number):
     """Select a specific board number"""
-    return spinapi.pb_select_board(board_number)
+    return _get_spinapi().pb_select_board(board_number)
 
 
 def pb_set_defaults():
     """Set board defaults. Must be called before using any other board functions."""
-    return spinapi.pb_set_defaults()
+    return _get_spinapi().pb_set_defaults()
 
 
 def pb_set_freq(*args):
-    t = list(args)
-    # Argument 0 must be a double
-    t[0] = ctypes.c_double(t[0])
-    args = tuple(t)
-    return spinapi.pb_set_freq(*args)
+    return _get_spinapi().pb_set_freq(*args)
 
 
 def pb_set_phase(*args):
-    t = list(args)
-    # Argument 0 must be a double
-    t[0] = ctypes.c_double(t[0])
-    args = tuple(t)
-    return spinapi.pb_set_phase(*args)
+    return _get_spinapi().pb_set_phase(*args)
 
 
 def pb_set_amp(*args):
-    t = list(args)
-    # Argument 0 must be a float
-    t[0] = ctypes.c_float(t[0])
-    args = tuple(t)
-    return spinapi.pb_set_amp(*args)
+    return _get_spinapi().pb_set_amp(*args)
 
 
 def pb_overflow(*args):
-    return spinapi.pb_overflow(*args)
+    return _get_spinapi().pb_overflow(*args)
 
 
 def pb_scan_count(*args):
-    return spinapi.pb_scan_count(*args)
+    return _get_spinapi().pb_scan_count(*args)
 
 
 def pb_set_num_points(*args):
-    return spinapi.pb_set_num_points(*args)
+    return _get_spinapi().pb_set_num_points(*args)
 
 
 def pb_set_radio_control(*args):
-    return spinapi.pb_set_radio_control(*args)
+    return _get_spinapi().pb_set_radio_control(*args)
 
 
 def pb_core_clock(clock):
-    return spinapi.pb_core_clock(ctypes.c_double(clock))
+    return _get_spinapi().pb_core_clock(clock)
 
 
 def pb_write_register(address, value):
-    return spinapi.pb_write_register(address, value)
+    return _get_spinapi().pb_write_register(address, value)
 
 
 def pb_start_programming(target):
-    return spinapi.pb_start_programming(target)
+    return _get_spinapi().pb_start_programming(target)
 
 
 def pb_stop_programming():
-    return spinapi.pb_stop_programming()
+    return _get_spinapi().pb_stop_programming()
 
 
 def pb_dds_load(*args):
     t = list(args)
-    # List of argument 0 must be floats
-    t[0] = (ctypes.c_float * len(t[0]))(*t[0])
+    # Argument 0 is passed in place, a numpy array of np.float32 avoids
+    # a copy, lists are converted in one vectorized step.
+    t[0] = np.ascontiguousarray(t[0], dtype=np.float32).ctypes.data_as(_C_FLOAT_P)
     args = tuple(t)
-    return spinapi.pb_dds_load(*args)
+    return _get_spinapi().pb_dds_load(*args)
 
 
 def pb_inst_pbonly(*args):
-    t = list(args)
-    # Argument 3 must be a double
-    t[3] = ctypes.c_double(t[3])
-    args = tuple(t)
-    return spinapi.pb_inst_pbonly(*args)
+    return _get_spinapi().pb_inst_pbonly(*args)
+
+
+def pb_inst_pbonly_batch(
+    flags: Iterable[Any],
+    inst: Iterable[Any],
+    inst_data: Iterable[Any],
+    lengths: Iterable[Any],
+) -> int:
+    """
+    Sends one pb_inst_pbonly instruction per entry of flags, inst,
+    inst_data and lengths. Each of them may be a list, a 1-D numpy array
+    or any iterable, e.g. itertools.repeat for a constant column; the
+    shortest one sets the number of instructions. SpinAPI has no entry
+    point taking an array of instructions, so they are still sent one by
+    one, but without going through pb_inst_pbonly for every instruction.
+    Stops at the first error and returns its status, otherwise returns
+    the status of the last instruction.
+    """
+    # numpy arrays are converted in one go, ctypes takes plain ints and
+    # floats faster than numpy scalars.
+    flags, inst, inst_data, lengths = (
+        column.tolist() if hasattr(column, "tolist") else column
+        for column in (flags, inst, inst_data, lengths)
+    )
+    inst_pbonly = _get_spinapi().pb_inst_pbonly
+    status = 0
+    for args in zip(flags, inst, inst_data, lengths):
+        status = inst_pbonly(*args)
+        if status < 0:
+            break
+    return status
 
 
 def pb_inst_radio(*args):
-    t = list(args)
-    # Argument 10 must be a double
-    t[10] = ctypes.c_double(t[10])
-    args = tuple(t)
-    return spinapi.pb_inst_radio(*args)
+    return _get_spinapi().pb_inst_radio(*args)
 
 
 def pb_inst_dds(FREQ, TX_PHASE, TX_ENABLE, PHASE_RESET, FLAGS, INST, INST_DATA, LENGTH):
@@ -487,11 +560,7 @@ def pb_inst_dds(FREQ, TX_PHASE, TX_ENABLE, PHASE_RESET, FLAGS, INST, INST_DATA,
 
 
 def pb_inst_radio_shape(*args):
-    t = list(args)
-    # Argument 12 must be a double
-    t[12] = ctypes.c_double(t[12])
-    args = tuple(t)
-    return spinapi.pb_inst_radio_shape(*args)
+    return _get_spinapi().pb_inst_radio_shape(*args)
 
 
 def pb_inst_dds_shape(
@@ -523,127 +592,202 @@ def pb_inst_dds_shape(
     )
 
 
+# One pb_inst_radio_shape instruction per record, in argument order,
+# see pb_inst_radio_shape_from_array.
+RADIO_SHAPE_INSTRUCTION = np.dtype(
+    [
+        ("freq", np.intc),
+        ("cos_phase", np.intc),
+        ("sin_phase", np.intc),
+        ("tx_phase", np.intc),
+        ("tx_enable", np.intc),
+        ("phase_reset", np.intc),
+        ("trigger_scan", np.intc),
+        ("use_shape", np.intc),
+        ("amp", np.intc),
+        ("flags", np.intc),
+        ("inst", np.intc),
+        ("inst_data", np.intc),
+        ("length", np.float64),
+    ]
+)
+
+
+@lru_cache(maxsize=1)
+def _radio_shape_kernel() -> Callable[[np.ndarray], int]:
+    """
+    Compiles the loop of pb_inst_radio_shape_from_array. The SpinAPI
+    function is bound as a constant and called natively, so the kernel
+    is built for the loaded library and not cached on disk.
+    """
+    if njit is None:
+        raise RuntimeError("numba is required to compile the radio shape loop")
+    inst_radio_shape = _get_spinapi().pb_inst_radio_shape
+
+    def kernel(instructions: np.ndarray) -> int:
+        status = 0
+        for i in range(instructions.shape[0]):
+            inst = instructions[i]
+            status = inst_radio_shape(
+                inst.freq,
+                inst.cos_phase,
+                inst.sin_phase,
+                inst.tx_phase,
+                inst.tx_enable,
+                inst.phase_reset,
+                inst.trigger_scan,
+                inst.use_shape,
+                inst.amp,
+                inst.flags,
+                inst.inst,
+                inst.inst_data,
+                inst.length,
+            )
+            if status < 0:
+                break
+        return status
+
+    compiled: Callable[[np.ndarray], int] = njit(kernel)
+    return compiled
+
+
+def pb_inst_radio_shape_from_array(instructions: Any) -> int:
+    """
+    Sends one pb_inst_radio_shape instruction per record of
+    instructions, a numpy array of dtype RADIO_SHAPE_INSTRUCTION (or
+    anything convertible to it). With numba installed the loop is
+    compiled and calls SpinAPI without going through Python per
+    instruction. Stops at the first error and returns its status,
+    otherwise returns the status of the last instruction.
+    """
+    instructions = np.asarray(instructions, dtype=RADIO_SHAPE_INSTRUCTION)
+    if njit is not None:
+        return _radio_shape_kernel()(instructions)
+    inst_radio_shape = _get_spinapi().pb_inst_radio_shape
+    status = 0
+    for args in instructions.tolist():
+        status = inst_radio_shape(*args)
+        if status < 0:
+            break
+    return status
+
+
 def pb_inst_dds2(*args):
-    t = list(args)
-    # Argument 13 must be a double
-    t[13] = ctypes.c_double(t[13])
-    args = tuple(t)
-    return spinapi.pb_inst_dds2(*args)
+    return _get_spinapi().pb_inst_dds2(*args)
 
 
 def pb_start():
-    return spinapi.pb_start()
+    return _get_spinapi().pb_start()
 
 
 def pb_stop():
-    return spinapi.pb_stop()
+    return _get_spinapi().pb_stop()
 
 
 def pb_reset():
-    return spinapi.pb_reset()
+    return _get_spinapi().pb_reset()
 
 
 def pb_close():
-    return spinapi.pb_close()
+    return _get_spinapi().pb_close()
 
 
 def pb_read_status():
-    return spinapi.pb_read_status()
+    return _get_spinapi().pb_read_status()
 
 
 def pb_status_message():
     """Return library version as UTF-8 encoded string."""
-    ret = spinapi.pb_status_message()
+    ret = _get_spinapi().pb_status_message()
     return str(ctypes.c_char_p(ret).value.decode("utf-8"))
 
 
 def pb_get_firmware_id():
-    return spinapi.pb_get_firmware_id()
+    return _get_spinapi().pb_get_firmware_id()
 
 
 def pb_sleep_ms(mlsc):
-    return spinapi.pb_sleep_ms(mlsc)
-
-
-def pb_get_data(num_points, real_data, imag_data):
-    # Create arrays to store the data
-    c_real_data = (ctypes.c_int * num_points)(*real_data)
-    c_imag_data = (ctypes.c_int * num_points)(*imag_data)
-
-    # Assign the memory address of the c_real_data and c_imag_data arrays to the pointer arguments
-    real_data_pointer = ctypes.cast(c_real_data, ctypes.POINTER(ctypes.c_int))
-    imag_data_pointer = ctypes.cast(c_imag_data, ctypes.POINTER(ctypes.c_int))
-
-    real_data.contents = real_data_pointer
-    imag_data.contents = imag_data_pointer
-
-    # Call the C function with the updated data pointers
-    result = spinapi.pb_get_data(num_points, real_data, imag_data)
-
-    return result
+    return _get_spinapi().pb_sleep_ms(mlsc)
+
+
+def pb_get_data(num_points, real_data=None, imag_data=None):
+    """
+    Reads num_points complex points from RAM. real_data and imag_data
+    may be numpy arrays of np.intc, which are filled in place and can be
+    reused between calls; new arrays are allocated if they are omitted.
+    Returns the real data, the imaginary data and the status.
+    """
+    if real_data is None:
+        real_data = np.empty(num_points, dtype=np.intc)
+    if imag_data is None:
+        imag_data = np.empty(num_points, dtype=np.intc)
+    real_data = _c_int_array(real_data, num_points)
+    imag_data = _c_int_array(imag_data, num_points)
+
+    result = _get_spinapi().pb_get_data(
+        num_points,
+        real_data.ctypes.data_as(_C_INT_P),
+        imag_data.ctypes.data_as(_C_INT_P),
+    )
 
+    return real_data, imag_data, result
 
-def pb_get_data_direct(num_points, data):
-    # Create a C-style array of shorts using ctypes
-    c_data = (ctypes.c_short * num_points)(*data)
 
-    # Assign the memory address of the c_data array to the pointer argument
-    data_pointer = ctypes.cast(c_data, ctypes.POINTER(ctypes.c_short))
-    data.contents = data_pointer
+def pb_get_data_direct(num_points, data=None):
+    """
+    Reads num_points points directly from RAM into data, a numpy array
+    of np.short filled in place, or a new one if it is omitted.
+    Returns the data and the status.
+    """
+    if data is None:
+        data = np.empty(num_points, dtype=np.short)
+    data = np.ascontiguousarray(data, dtype=np.short)
+    if data.size < num_points:
+        raise ValueError(f"Expected at least {num_points} data points, got {data.size}")
 
-    # Call the C function with the updated data pointer
-    result = spinapi.pb_get_data_direct(num_points, data)
+    result = _get_spinapi().pb_get_data_direct(
+        num_points, data.ctypes.data_as(ctypes.POINTER(ctypes.c_short))
+    )
 
-    return result
+    return data, result
 
 
 def pb_unset_radio_control(ctrl):
-    return spinapi.pb_unset_radio_control(ctrl)
+    return _get_spinapi().pb_unset_radio_control(ctrl)
 
 
 def pb_write_felix(*args):
     t = list(args)
-    t[0] = ctypes.c_char_p(t[0].encode())
-    t[1] = ctypes.c_char_p(t[1].encode())
-    # Argument 3 must be a float
-    t[3] = ctypes.c_float(t[3])
-    # Argument 4 must be a float
-    t[4] = ctypes.c_float(t[4])
-    # List of argument 5 must be integers
-    t[5] = (ctypes.c_int * len(t[5]))(*t[5])
-    # List of argument 6 must be integers
-    t[6] = (ctypes.c_int * len(t[6]))(*t[6])
+    # The file name may be a str, bytes or path, ctypes takes the bytes.
+    t[0] = os.fsencode(t[0])
+    if isinstance(t[1], str):
+        t[1] = t[1].encode()
+    # Arguments 5 and 6 are passed in place, numpy arrays of np.intc
+    # avoid a copy.
+    t[5] = _c_int_array(t[5], t[2]).ctypes.data_as(_C_INT_P)
+    t[6] = _c_int_array(t[6], t[2]).ctypes.data_as(_C_INT_P)
     args = tuple(t)
-    return spinapi.pb_write_felix(*args)
+    return _get_spinapi().pb_write_felix(*args)
 
 
 def pb_setup_filters(*args):
-    t = list(args)
-    # Argument 0 must be a double
-    t[0] = ctypes.c_double(t[0])
-    args = tuple(t)
-    return spinapi.pb_setup_filters(*args)
+    return _get_spinapi().pb_setup_filters(*args)
 
 
 def pb_inst_radio_shape_cyclops(*args):
-    t = list(args)
-    # Argument 15 must be a double
-    t[15] = ctypes.c_double(t[15])
-    args = tuple(t)
-    return spinapi.pb_inst_radio_shape_cyclops(*args)
+    return _get_spinapi().pb_inst_radio_shape_cyclops(*args)
 
 
 def pb_fft_find_resonance(num_points, SF, SW, real_data, imag_data):
-    # Create a C-style array of ints using ctypes
-    c_real_data = (ctypes.c_int * num_points)(*real_data)
-    c_imag_data = (ctypes.c_int * num_points)(*imag_data)
-
-    # Assign the memory address of the c_data arrays to the pointer arguments
-    real_data_pointer = ctypes.cast(c_real_data, ctypes.POINTER(ctypes.c_int))
-    imag_data_pointer = ctypes.cast(c_imag_data, ctypes.POINTER(ctypes.c_int))
+    # Pass the data in place, real_data and imag_data should be numpy
+    # arrays of np.intc to avoid a copy.
+    c_real_data = _c_int_array(real_data, num_points)
+    c_imag_data = _c_int_array(imag_data, num_points)
+    real_data_pointer = c_real_data.ctypes.data_as(_C_INT_P)
+    imag_data_pointer = c_imag_data.ctypes.data_as(_C_INT_P)
 
     # Call the C function with the updated data pointers
-    result = spinapi.pb_fft_find_resonance(
+    result = _get_spinapi().pb_fft_find_resonance(
         num_points, SF, SW, real_data_pointer, imag_data_pointer
     )
 
@@ -651,31 +795,33 @@ def pb_fft_find_resonance(num_points, SF, SW, real_data, imag_data):
 
 
 def pb_write_ascii(fname, num_points, SW, real_data, imag_data):
-    # Convert the file name to a C-style string
-    c_fname = ctypes.c_char_p(fname.encode())
+    # The file name may be a str, bytes or path, ctypes takes the bytes.
+    c_fname = os.fsencode(fname)
 
-    # Convert the Python lists to C-style arrays
-    c_real_data = (ctypes.c_int * num_points)(*real_data)
-    c_imag_data = (ctypes.c_int * num_points)(*imag_data)
+    # Pass the data in place, real_data and imag_data should be numpy
+    # arrays of np.intc to avoid a copy.
+    c_real_data = _c_int_array(real_data, num_points).ctypes.data_as(_C_INT_P)
+    c_imag_data = _c_int_array(imag_data, num_points).ctypes.data_as(_C_INT_P)
 
     # Call the C function
-    result = spinapi.pb_write_ascii(c_fname, num_points, SW, c_real_data, c_imag_data)
+    result = _get_spinapi().pb_write_ascii(
+        c_fname, num_points, SW, c_real_data, c_imag_data
+    )
 
     return result
 
 
 def pb_write_ascii_verbose(fname, num_points, SW, SF, real_data, imag_data):
-    # Convert the file name to a C-style string
-    c_fname = ctypes.c_char_p(fname.encode())
+    # The file name may be a str, bytes or path, ctypes takes the bytes.
+    c_fname = os.fsencode(fname)
 
-    # Convert the Python lists to C-style arrays
-    c_real_data = (ctypes.c_int * num_points)(*real_data)
-    c_imag_data = (ctypes.c_int * num_points)(*imag_data)
+    # Pass the data in place, real_data and imag_data should be numpy
+    # arrays of np.intc to avoid a copy.
+    c_real_data = _c_int_array(real_data, num_points).ctypes.data_as(_C_INT_P)
+    c_imag_data = _c_int_array(imag_data, num_points).ctypes.data_as(_C_INT_P)
 
     # Call the C function
-    SW = ctypes.c_float(SW)
-    SF = ctypes.c_float(SF)
-    result = spinapi.pb_write_ascii_verbose(
+    result = _get_spinapi().pb_write_ascii_verbose(
         c_fname, num_points, SW, SF, c_real_data, c_imag_data
     )
 
@@ -683,18 +829,16 @@ def pb_write_ascii_verbose(fname, num_points, SW, SF, real_data, imag_data):
 
 
 def pb_write_jcamp(fname, num_points, SW, SF, real_data, imag_data):
-    # Convert the file name to a C-style string
-    c_fname = ctypes.c_char_p(fname.encode())
-
-    # Convert the Python lists to C-style arrays
-    c_real_data = (ctypes.c_int * num_points)(*real_data)
-    c_imag_data = (ctypes.c_int * num_points)(*imag_data)
+    # The file name may be a str, bytes or path, ctypes takes the bytes.
+    c_fname = os.fsencode(fname)
 
-    SF = ctypes.c_float(SF)
-    SW = ctypes.c_float(SW)
+    # Pass the data in place, real_data and imag_data should be numpy
+    # arrays of np.intc to avoid a copy.
+    c_real_data = _c_int_array(real_data, num_points).ctypes.data_as(_C_INT_P)
+    c_imag_data = _c_int_array(imag_data, num_points).ctypes.data_as(_C_INT_P)
 
     # Call the C function
-    result = spinapi.pb_write_jcamp(
+    result = _get_spinapi().pb_write_jcamp(
         c_fname, num_points, SW, SF, c_real_data, c_imag_data
     )
 
@@ -703,4 +847,4 @@ def pb_write_jcamp(fname, num_points, SW, SF, real_data, imag_data):
 
 def pb_set_scan_segments(num_segments):
     # Call the C function
-    return spinapi.pb_set_scan_segments(num_segments)
+    return _get_spinapi().pb_set_scan_segments(num_segments)
@@ -9,9 +9,11 @@ import threading
 import traceback
 import os
 import platform
+import signal
 from datetime import date
 from time import sleep
-from queue import Queue
+from queue import Empty, Queue
+from types import FrameType
 from typing import Optional
 from pathlib import Path
 
@@ -34,6 +36,11 @@ from qupyt.measurement_logic.run_measurement import run_measurement
 from qupyt.hardware.signal_sources import SignalSource
 from qupyt.set_up import get_waiting_room, make_userdirs, get_log_dir, get_home_dir
 
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
 qupyt_logo_text = """                                                                                                        
                                                                                                          
      QQQQQQQQQ                       PPPPPPPPPPPPPPPPP                                     tttt          
@@ -84,8 +91,8 @@ logging.basicConfig(
     force=True,
 )
 
-queue: Queue[str]
-event_thread: threading.Event
+# Instruction files for the measurement loop, None stops it.
+queue: Queue[Optional[str]]
 
 
 def _set_busy() -> None:
@@ -106,13 +113,15 @@ def parse_input() -> None:
             static_devices.update_devices({})
             dynamic_devices.update_devices({})
             _set_ready()
-            event_thread.wait()
+        # Blocks until the next instruction file arrives.
+        instruction_file = queue.get()
+        if instruction_file is None:
+            break
         try:
             _set_busy()
             logging.info("STARTED NEW MEASUREMENT".ljust(65, "=") + "[START]")
-            instruction_file = queue.get()
             with open(instruction_file, "r", encoding="utf-8") as file:
-                params = yaml.safe_load(file)
+                params = yaml.load(file, Loader=_YamlLoader)
             os.rename(instruction_file, instruction_file + "_running")
             parameter_update = write_user_ps(
                 Path(params["ps_path"]), params["pulse_sequence"]
@@ -188,59 +197,54 @@ class WaitingRoomEventHandler(PatternMatchingEventHandler):
         Handle the event when a monitored file is closed.
 
         This method is called when a file matching the specified patterns is closed.
-        It puts the file path in a queue and triggers the event thread.
+        It puts the file path in the queue of the measurement loop.
 
         Args:
             event (FileClosedEvent): The event object containing information about the closed file.
         """
         queue.put(event.src_path)
-        event_thread.set()
-        event_thread.clear()
 
     def _on_modified(self, event: FileModifiedEvent) -> None:
         """
         Handle the event when a monitored file is modified.
 
         This method is called when a file matching the specified patterns is modified.
-        It puts the file path in a queue, waits briefly, and triggers the event thread.
+        It waits briefly for the file to be written and puts its path in the queue.
 
         Args:
             event (FileModifiedEvent): The event object containing information about the modified file.
         """
-        queue.put(event.src_path)
+        # Give the writer a moment to finish the file before it is read.
         sleep(0.1)
-        event_thread.set()
-        event_thread.clear()
+        queue.put(event.src_path)
 
     def _on_created(self, event) -> None:
         """
         Handle the event when a monitored file is created.
 
         This method is called when a file matching the specified patterns is created.
-        It puts the file path in a queue, waits briefly, and triggers the event thread.
+        It waits briefly for the file to be written and puts its path in the queue.
 
         Args:
             event: The event object containing information about the modified file.
         """
-        queue.put(event.src_path)
+        # Give the writer a moment to finish the file before it is read.
         sleep(0.1)
-        event_thread.set()
-        event_thread.clear()
+        queue.put(event.src_path)
 
     def _on_moved(self, event) -> None:
         """
         Handle the event when a monitored file is moved.
 
         This method is called when a file matching the specified patterns is moved.
-        It puts the file path in a queue, waits briefly, and triggers the event thread.
+        It waits briefly for the file to be written and puts its path in the queue.
 
         Args:
             event: The event object containing information about the modified file.
         """
-        queue.put(event.src_path)
+        # Give the writer a moment to finish the file before it is read.
         sleep(0.1)
-        event_thread.set()
-        event_thread.clear()
+        queue.put(event.src_path)
 
 
 def _get_observer_event_hanlder() -> WaitingRoomEventHandler:
@@ -266,23 +270,38 @@ def main() -> None:
     Start the main measurement loop.
     """
     logging.info("Started Program")
-    global event_thread
-    event_thread = threading.Event()
     global queue
     queue = Queue()
     event_handler = _get_observer_event_hanlder()
     observer = _get_observer(event_handler)
     thread = threading.Thread(target=parse_input)
+
+    def _stop(signum: int, frame: Optional[FrameType]) -> None:
+        # The first Ctrl+C stops watching for new files, a second one
+        # raises KeyboardInterrupt as usual.
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        observer.stop()
+
+    signal.signal(signal.SIGINT, _stop)
     observer.start()
     thread.start()
     try:
+        # Joined with a timeout since waiting on a lock cannot be
+        # interrupted by Ctrl+C on Windows. Elsewhere the join returns
+        # right after _stop.
+        while observer.is_alive():
+            observer.join(1)
+    finally:
+        # Files still queued are not measured, they stay in the waiting
+        # room. The measurement loop finishes the running measurement
+        # and exits on the sentinel.
         while True:
-            sleep(0.5)
-    except KeyboardInterrupt:
-        observer.stop()
-        observer.join()
-        thread.join()
-        queue.join()
+            try:
+                queue.get_nowait()
+            except Empty:
+                break
+        queue.put(None)
+    thread.join()
 
 
 if __name__ == "__main__":
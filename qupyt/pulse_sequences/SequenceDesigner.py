@@ -8,6 +8,36 @@ from termcolor import colored
 import yaml
 from qupyt.set_up import get_seq_dir
 
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+
+# Parsed sequence files by blake2b digest of their content, oldest first.
+_YAML_CACHE: Dict[bytes, Dict[str, Any]] = {}
+_YAML_CACHE_SIZE = 32
+
+
+def load_yaml_sequence(path: Path) -> Dict[str, Any]:
+    """
+    Returns the parsed yaml pulse sequence file at path. The file is
+    read on every call, but only parsed again if its content changed
+    since it was last loaded. The returned dict is shared between
+    callers and must not be modified.
+    """
+    # Read in binary mode, the loader detects and decodes UTF-8 itself.
+    with open(path, "rb") as file:
+        data = file.read()
+    digest = hashlib.blake2b(data, digest_size=16).digest()
+    sequence = _YAML_CACHE.pop(digest, None)
+    if sequence is None:
+        sequence = yaml.load(data, Loader=_YamlLoader)
+        if len(_YAML_CACHE) >= _YAML_CACHE_SIZE:
+            del _YAML_CACHE[next(iter(_YAML_CACHE))]
+    _YAML_CACHE[digest] = sequence
+    return sequence
+
 
 class PulseSequenceYaml:
     def __init__(
@@ -29,12 +59,12 @@ class PulseSequenceYaml:
 
     def _sequence_didnt_change(self) -> bool:
         with open(self.yaml_file, "r", encoding="utf-8") as file:
-            sequence_instructions = yaml.safe_load(file)
+            sequence_instructions = yaml.load(file, Loader=_YamlLoader)
         try:
             with open(
                 self.yaml_file.with_suffix(".aux"), "r", encoding="utf-8"
             ) as file:
-                previous_sequence_instructions = yaml.safe_load(file)
+                previous_sequence_instructions = yaml.load(file, Loader=_YamlLoader)
             with open(
                 self.yaml_file.with_suffix(".aux"), "w", encoding="utf-8"
             ) as file:
@@ -51,7 +81,7 @@ class PulseSequenceYaml:
         if self._sequence_didnt_change():
             return
         with open(self.yaml_file, "r", encoding="utf-8") as file:
-            sequence_instructions = yaml.safe_load(file)
+            sequence_instructions = yaml.load(file, Loader=_YamlLoader)
         sequence_order = sequence_instructions["sequencing_order"]
         sequencing_repeats = sequence_instructions["sequencing_repeats"]
         duration = float(sequence_instructions["total_duration"])
@@ -205,26 +235,39 @@ class PulseSequence:
             )
             + "[done]"
         )
-        final = np.zeros((self.numseqs, 2 * len(self.awg_sources), self.num_points))
-        for source_index, source in enumerate(self.awg_sources):
-            final[:, 2 * source_index, :] = self.pulses[:, 5 * source_index, :]
-            final[:, 2 * source_index + 1, :] = (
-                self.pulses[:, 5 * source_index + 1, :] * 2**7
-                + self.pulses[:, 5 * source_index + 2, :] * 2**6
-                + self.pulses[:, 5 * source_index + 3, :] * 2**5
-                + self.pulses[:, 5 * source_index + 4, :] * 2**4
-            )
+        # Analog samples are stored in the float32 format the AWG is sent,
+        # the four 1 bit markers of a source are packed into bits 7 to 4
+        # of one byte per sample.
+        pulses = self.pulses.reshape(
+            self.numseqs, len(self.awg_sources), 5, self.num_points
+        )
+        analog = np.ascontiguousarray(pulses[:, :, 0, :], dtype=np.float32)
+        markers = (
+            pulses[:, :, 1, :] * 2**7
+            + pulses[:, :, 2, :] * 2**6
+            + pulses[:, :, 3, :] * 2**5
+            + pulses[:, :, 4, :] * 2**4
+        ).astype(np.uint8)
 
-        hash1 = hashlib.sha1(final.tobytes()).hexdigest()
+        hash1 = hashlib.sha1(analog.tobytes() + markers.tobytes()).hexdigest()
         hash2 = hashlib.sha1(str(self.sequencer).encode("utf-8")).hexdigest()
         hash3 = hashlib.sha1(str(self.sequencernames).encode("utf-8")).hexdigest()
         hash4 = hash1 + hash2 + hash3
         finalhash = hashlib.sha1(hash4.encode("utf-8")).hexdigest()
 
         file_dir = get_seq_dir()
+        # The waveforms are stored in separate .npy files, which the
+        # AWG memory maps instead of reading the whole block at once.
+        # The archive only holds the names of those files.
+        waveform_files = [
+            Path(name).stem + "_analog.npy",
+            Path(name).stem + "_markers.npy",
+        ]
+        np.save(file_dir / waveform_files[0], analog)
+        np.save(file_dir / waveform_files[1], markers)
         np.savez(
             file_dir / name,
-            final,
+            waveform_files,
             self.sequencer,
             self.sequencernames,
             finalhash,
@@ -252,9 +295,7 @@ class PulseBlasterSequence:
         self.total_duration = self.yaml_sequence["total_duration"]
 
     def _load_yaml_sequence(self, path: Path) -> Dict[str, Any]:
-        with open(path, "r", encoding="utf-8") as file:
-            yaml_sequence = yaml.safe_load(file)
-        return yaml_sequence
+        return load_yaml_sequence(path)
 
     def parse_pulse_sequence_file(self) -> None:
         for block in self.yaml_sequence["sequencing_order"]:
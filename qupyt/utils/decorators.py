@@ -11,19 +11,20 @@ def coerce_device_config_shape(func):
     to QuPyt devices to adhere to a unified shape.
     User configuration can thus be kept simple.
     Their shape is adapted in this decorator.
+    Keyword arguments are passed on unchanged.
 
     Raises:
         ValueError
     """
 
     @wraps(func)
-    def wrapper(self, arg):
+    def wrapper(self, arg, **kwargs):
         if isinstance(arg, list):
-            return func(self, arg)
+            return func(self, arg, **kwargs)
         if isinstance(arg, tuple):
-            return func(self, [arg])
+            return func(self, [arg], **kwargs)
         if isinstance(arg, (float, int, str)):
-            return func(self, [("channel_1", arg)])
+            return func(self, [("channel_1", arg)], **kwargs)
         raise ValueError
 
     return wrapper
@@ -31,14 +32,15 @@ def coerce_device_config_shape(func):
 
 def loop_inputs(func):
     @wraps(func)
-    def wrapper(self, arg):
+    def wrapper(self, arg, **kwargs):
         for inp in arg:
             channel = inp[0].split("_")[-1]
-            if isinstance(inp[1], str):
+            value = inp[1]
+            if isinstance(value, str):
                 try:
-                    inp[1] = float(inp[1])
-                except:
+                    value = float(value)
+                except ValueError:
                     pass
-            func(self, (channel, inp[1]))
+            func(self, (channel, value), **kwargs)
 
     return wrapper